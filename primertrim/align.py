@@ -1,5 +1,6 @@
 import subprocess
 import tempfile
+import threading
 
 DEFAULT_BLAST_FIELDS = [
     "qseqid",
@@ -69,7 +70,16 @@ class VsearchAligner:
         self.stderr = subprocess.DEVNULL
 
     def search(self, seqs, input_fp=None, output_fp=None, **kwargs):
-        """Search seqs and return hits"""
+        """Search seqs and return hits
+
+        If no input or output filepaths are given, the query sequences
+        are sent to vsearch through a pipe, and the hits are parsed as
+        they are written, without using any files on disk.
+        """
+        if (input_fp is None) and (output_fp is None):
+            yield from self._search_piped(seqs, **kwargs)
+            return
+
         if input_fp is None:
             infile = tempfile.NamedTemporaryFile(
                 suffix=".fasta", mode="w+t", encoding="utf-8"
@@ -91,7 +101,33 @@ class VsearchAligner:
             for hit in self.parse(f):
                 yield hit
 
-    def _call(self, query_fp, output_fp, min_id=0.85, threads=None):
+    def _search_piped(self, seqs, **kwargs):
+        args = self._args("-", "/dev/stdout", **kwargs)
+        proc = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=self.stderr,
+            text=True,
+        )
+        # Queries are written from a separate thread, so that vsearch
+        # never blocks on a full output pipe while we are writing.
+        writer = threading.Thread(target=_write_queries, args=(proc.stdin, seqs))
+        writer.start()
+        try:
+            yield from self.parse(proc.stdout)
+        finally:
+            proc.stdout.close()
+            writer.join()
+            returncode = proc.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, args)
+
+    def _call(self, query_fp, output_fp, **kwargs):
+        args = self._args(query_fp, output_fp, **kwargs)
+        subprocess.check_call(args, stderr=self.stderr)
+
+    def _args(self, query_fp, output_fp, min_id=0.85, threads=None):
         id_arg = "{:.3f}".format(min_id)
         userfields_arg = "+".join(BLAST_TO_VSEARCH[f] for f in self.fields)
         args = [
@@ -123,17 +159,25 @@ class VsearchAligner:
         if threads is not None:
             threads_arg = "{:d}".format(threads)
             args.extend(["--threads", threads_arg])
-        subprocess.check_call(args, stderr=self.stderr)
+        return args
 
     def parse(self, f):
+        if self.convert_types:
+            converters = [BLAST_FIELD_TYPES[field] for field in self.fields]
         for line in f:
             line = line.strip()
-            if line.startswith("#"):
+            if (not line) or line.startswith("#"):
                 continue
             vals = line.split("\t")
-            res = dict(zip(self.fields, vals))
             if self.convert_types:
-                for field in self.fields:
-                    fcn = BLAST_FIELD_TYPES[field]
-                    res[field] = fcn(res[field])
-            yield res
+                vals = [fcn(val) for fcn, val in zip(converters, vals)]
+            yield dict(zip(self.fields, vals))
+
+
+def _write_queries(f, seqs):
+    try:
+        write_fasta(f, seqs)
+        f.close()
+    except BrokenPipeError:
+        # vsearch has exited; the error is reported from its exit code
+        pass
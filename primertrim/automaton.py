@@ -0,0 +1,112 @@
+import collections
+
+
+class AhoCorasick:
+    """Find all occurrences of many patterns in a single pass over the text"""
+
+    def __init__(self, patterns):
+        self.patterns = list(dict.fromkeys(patterns))
+        alphabet = set("".join(self.patterns))
+
+        # Build the trie of patterns
+        goto = [{}]
+        outputs = [[]]
+        for pattern in self.patterns:
+            state = 0
+            for char in pattern:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].append(pattern)
+
+        # Add failure links in breadth-first order, so that the
+        # transitions of each state's failure state are complete by
+        # the time we need them.  The result is a deterministic
+        # automaton with one transition per state and character.
+        fail = [0] * len(goto)
+        self.transitions = [dict() for _ in goto]
+        queue = collections.deque()
+        for char in alphabet:
+            next_state = goto[0].get(char, 0)
+            self.transitions[0][char] = next_state
+            if next_state != 0:
+                queue.append(next_state)
+        while queue:
+            state = queue.popleft()
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            for char in alphabet:
+                if char in goto[state]:
+                    next_state = goto[state][char]
+                    fail[next_state] = self.transitions[fail[state]][char]
+                    self.transitions[state][char] = next_state
+                    queue.append(next_state)
+                else:
+                    self.transitions[state][char] = self.transitions[fail[state]][char]
+        self.outputs = outputs
+
+    def iter_matches(self, text):
+        """Yields (end index, pattern) for each pattern found in text
+
+        The end index is the position of the last character of the
+        pattern in the text.
+        """
+        transitions = self.transitions
+        outputs = self.outputs
+        state = 0
+        for idx, char in enumerate(text):
+            state = transitions[state].get(char, 0)
+            for pattern in outputs[state]:
+                yield idx, pattern
+
+
+class PrefixTrie:
+    """Find which of many patterns is a prefix of a text
+
+    Patterns earlier in the list take priority over later patterns.
+    The text is walked once, so the time to search does not depend on
+    the number of patterns.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.transitions = [{}]
+        parents = [0]
+        pattern_idxs = [None]
+        for pattern_idx, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                if char not in self.transitions[state]:
+                    self.transitions.append({})
+                    parents.append(state)
+                    pattern_idxs.append(None)
+                    self.transitions[state][char] = len(self.transitions) - 1
+                state = self.transitions[state][char]
+            if pattern_idxs[state] is None:
+                pattern_idxs[state] = pattern_idx
+
+        # For each state, store the first pattern ending at that state
+        # or any state before it.  States are created after their
+        # parents, so the parent is always filled in first.
+        self.outputs = pattern_idxs
+        for state in range(1, len(self.outputs)):
+            parent_idx = self.outputs[parents[state]]
+            if (parent_idx is not None) and (
+                (self.outputs[state] is None) or (parent_idx < self.outputs[state])
+            ):
+                self.outputs[state] = parent_idx
+
+    def find_prefix(self, text):
+        """Return the index of the first pattern that is a prefix of text
+
+        Returns None if no pattern is a prefix of the text.
+        """
+        transitions = self.transitions
+        state = 0
+        for char in text:
+            next_state = transitions[state].get(char)
+            if next_state is None:
+                break
+            state = next_state
+        return self.outputs[state]
@@ -0,0 +1,186 @@
+import argparse
+import concurrent.futures
+import copy
+import glob
+import os
+
+from .command import (
+    add_trimming_arguments,
+    check_trimming_arguments,
+    get_alignment_matchers,
+    get_matchers,
+    trim_fastq,
+)
+
+FASTQ_EXTENSIONS = [".fastq", ".fq"]
+COMPRESSED_EXTENSIONS = [".gz", ".bgz", ".zst"]
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(
+        description=(
+            "Trim primers from many FASTQ files in one process, re-using "
+            "the same matchers for every sample."
+        )
+    )
+    p.add_argument("primer", nargs="+", help="Primer sequence to be trimmed")
+
+    io_group = p.add_argument_group("File I/O")
+    samples_group = io_group.add_mutually_exclusive_group(required=True)
+    samples_group.add_argument(
+        "--manifest",
+        help=(
+            "Tab-separated file with one sample per line, listing the "
+            "input FASTQ, output FASTQ, and (optionally) log filepaths"
+        ),
+    )
+    samples_group.add_argument(
+        "--input-glob",
+        help=(
+            "Pattern matching input FASTQ files, e.g. 'reads/*.fastq.gz'. "
+            "Requires --output-dir"
+        ),
+    )
+    io_group.add_argument(
+        "--output-dir",
+        help=(
+            "Directory for output FASTQ and log files with --input-glob. "
+            "Output files have the same name as the input files"
+        ),
+    )
+    io_group.add_argument(
+        "--log-summaries",
+        action="store_true",
+        help=(
+            "Write a summary of each log file in JSON format, next to the "
+            "log file, for combining results across samples"
+        ),
+    )
+    io_group.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of samples to trim at the same time (default: %(default)s)",
+    )
+    add_trimming_arguments(p, io_group)
+    args = p.parse_args(argv)
+    check_trimming_arguments(p, args)
+
+    if args.manifest:
+        with open(args.manifest) as f:
+            samples = list(parse_manifest(f))
+    elif args.output_dir:
+        log_ext = ".parquet" if args.log_format == "parquet" else ".log"
+        samples = list(samples_from_glob(args.input_glob, args.output_dir, log_ext))
+    else:
+        p.error("--input-glob requires --output-dir")
+    if (args.workers > 1) and (args.jobs > 1):
+        p.error("--workers and --jobs cannot both be greater than 1")
+
+    trim_samples(args, samples)
+
+
+def parse_manifest(f):
+    for line in f:
+        line = line.rstrip("\n")
+        if (not line.strip()) or line.startswith("#"):
+            continue
+        vals = line.split("\t")
+        if len(vals) == 2:
+            input_fp, output_fp = vals
+            log_fp = None
+        elif len(vals) == 3:
+            input_fp, output_fp, log_fp = vals
+        else:
+            raise ValueError(
+                "Manifest lines must have 2 or 3 tab-separated fields: {}".format(line)
+            )
+        yield input_fp, output_fp, log_fp or None
+
+
+def samples_from_glob(pattern, output_dir, log_ext=".log"):
+    for input_fp in sorted(glob.glob(pattern)):
+        filename = os.path.basename(input_fp)
+        output_fp = os.path.join(output_dir, filename)
+        if os.path.abspath(output_fp) == os.path.abspath(input_fp):
+            raise ValueError(
+                "Output file would overwrite input file: {}".format(input_fp)
+            )
+        log_fp = os.path.join(output_dir, sample_name(filename) + log_ext)
+        yield input_fp, output_fp, log_fp
+
+
+def summary_path(log_fp):
+    """Filepath of the summary written next to a log file"""
+    name, ext = os.path.splitext(log_fp)
+    if ext.lower() in COMPRESSED_EXTENSIONS:
+        name, ext = os.path.splitext(name)
+    return name + ".summary.json"
+
+
+def sample_name(filename):
+    """Remove FASTQ and compression extensions from a filename"""
+    name, ext = os.path.splitext(filename)
+    if ext.lower() in COMPRESSED_EXTENSIONS:
+        name, ext = os.path.splitext(name)
+    if ext.lower() in FASTQ_EXTENSIONS:
+        return name
+    return filename
+
+
+def trim_samples(args, samples):
+    """Trim a list of (input, output, log) filepaths
+
+    Matchers are built once, and shared by all the samples.  With more
+    than one worker, each worker process builds its own alignment
+    matcher and trims one sample at a time.  With --log-summaries, a
+    summary is written next to each log file.
+    """
+    for _, output_fp, log_fp in samples:
+        for fp in [output_fp, log_fp]:
+            if fp and os.path.dirname(fp):
+                os.makedirs(os.path.dirname(fp), exist_ok=True)
+
+    if args.log_summaries:
+        samples = [
+            (input_fp, output_fp, log_fp, summary_path(log_fp) if log_fp else None)
+            for input_fp, output_fp, log_fp in samples
+        ]
+
+    matchers = get_matchers(args, args.primer)
+    if args.workers <= 1:
+        alignment_matchers = get_alignment_matchers(args, args.primer)
+        for sample in samples:
+            trim_fastq(args, matchers, alignment_matchers, *sample)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+        args.workers,
+        initializer=_init_worker,
+        initargs=(args, matchers),
+    ) as executor:
+        for _ in executor.map(_trim_sample, samples):
+            pass
+
+
+# State for the current worker process, set once when the worker
+# starts.
+_worker_state = None
+
+
+def _init_worker(args, matchers):
+    global _worker_state
+    if args.alignment_dir:
+        # Keep the alignment files of each worker apart
+        args = copy.copy(args)
+        args.alignment_dir = os.path.join(
+            args.alignment_dir, "worker{}".format(os.getpid())
+        )
+        os.makedirs(args.alignment_dir, exist_ok=True)
+    alignment_matchers = get_alignment_matchers(args, args.primer)
+    _worker_state = (args, matchers, alignment_matchers)
+
+
+def _trim_sample(sample):
+    args, matchers, alignment_matchers = _worker_state
+    trim_fastq(args, matchers, alignment_matchers, *sample)
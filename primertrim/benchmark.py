@@ -0,0 +1,325 @@
+import argparse
+import io
+import json
+import random
+import sys
+import time
+
+from .engines import MATCHING_ENGINES, build_matchers, deambiguate_primers
+from .dna import AMBIGUOUS_BASES, reverse_complement
+from .fastq import parse_fastq, write_fastq
+from .logfile import write_log
+from .matcher import ALIGNMENT_BACKENDS, AlignmentMatcher
+from .stats import peak_rss_mb
+from .trimmable_reads import TrimmableReads
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(
+        description=(
+            "Time each stage of primer trimming on simulated reads, and "
+            "compare the results to a saved baseline."
+        )
+    )
+    p.add_argument("primer", nargs="+", help="Primer sequence to be trimmed")
+
+    sim_group = p.add_argument_group("Simulated reads")
+    sim_group.add_argument(
+        "--num-reads",
+        type=int,
+        default=100000,
+        help="Number of reads to simulate (default: %(default)s)",
+    )
+    sim_group.add_argument(
+        "--read-length",
+        type=int,
+        default=250,
+        help="Length of simulated reads (default: %(default)s)",
+    )
+    sim_group.add_argument(
+        "--primer-fraction",
+        type=float,
+        default=0.5,
+        help="Fraction of reads containing a primer (default: %(default)s)",
+    )
+    sim_group.add_argument(
+        "--min-primer-start",
+        type=int,
+        default=0,
+        help="Minimum start position of the primer (default: %(default)s)",
+    )
+    sim_group.add_argument(
+        "--max-primer-start",
+        type=int,
+        help=(
+            "Maximum start position of the primer. Primers starting near "
+            "the end of the read are cut off (default: read length)"
+        ),
+    )
+    sim_group.add_argument(
+        "--mismatch-rate",
+        type=float,
+        default=0.02,
+        help="Probability of a mismatch at each primer base (default: %(default)s)",
+    )
+    sim_group.add_argument(
+        "--revcomp-fraction",
+        type=float,
+        default=0.5,
+        help=(
+            "Fraction of primers inserted as the reverse complement "
+            "(default: %(default)s)"
+        ),
+    )
+    sim_group.add_argument(
+        "--seed", type=int, default=0, help="Random seed (default: %(default)s)"
+    )
+
+    matching_group = p.add_argument_group("Matching")
+    matching_group.add_argument(
+        "--no-revcomp",
+        action="store_true",
+        help="Do not search for the reverse complement of the primer",
+    )
+    matching_group.add_argument(
+        "--mismatches",
+        type=int,
+        default=1,
+        help="Number of mismatches to primer allowed (default: %(default)s)",
+    )
+    matching_group.add_argument(
+        "--min-partial",
+        type=int,
+        default=8,
+        help="Minimum length of partial primer match (default: %(default)s)",
+    )
+    matching_group.add_argument(
+        "--engine",
+        choices=MATCHING_ENGINES,
+        default="python",
+        help="Implementation of the complete and partial matching stages "
+        "(default: %(default)s)",
+    )
+    matching_group.add_argument(
+        "--alignment",
+        action="store_true",
+        help="Also time the alignment matching stage",
+    )
+    matching_group.add_argument(
+        "--aligner",
+        choices=ALIGNMENT_BACKENDS,
+        default="vsearch",
+        help="Program used for the alignment stage (default: %(default)s)",
+    )
+    matching_group.add_argument(
+        "--align_id",
+        type=float,
+        default=0.85,
+        help="Alignment identity threshold (default: %(default)s)",
+    )
+
+    results_group = p.add_argument_group("Results")
+    results_group.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help=(
+            "Number of times to run each stage. The fastest time is "
+            "reported (default: %(default)s)"
+        ),
+    )
+    results_group.add_argument(
+        "--output", help="Save the results as JSON, for use as a baseline"
+    )
+    results_group.add_argument(
+        "--baseline", help="Compare the results to a baseline JSON file"
+    )
+    results_group.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help=(
+            "Report a regression if any stage processes fewer reads per "
+            "second than the baseline by more than this fraction "
+            "(default: %(default)s)"
+        ),
+    )
+    args = p.parse_args(argv)
+
+    if args.max_primer_start is None:
+        args.max_primer_start = args.read_length
+    if args.min_primer_start < 0:
+        p.error("--min-primer-start cannot be negative")
+    if args.max_primer_start > args.read_length:
+        p.error("--max-primer-start is greater than --read-length")
+    if args.min_primer_start > args.max_primer_start:
+        p.error("--min-primer-start is greater than --max-primer-start")
+
+    reads = list(
+        simulate_reads(
+            args.primer,
+            args.num_reads,
+            args.read_length,
+            primer_fraction=args.primer_fraction,
+            primer_start_range=(args.min_primer_start, args.max_primer_start),
+            mismatch_rate=args.mismatch_rate,
+            revcomp_fraction=args.revcomp_fraction,
+            seed=args.seed,
+        )
+    )
+    fastq = io.StringIO()
+    write_fastq(fastq, reads)
+
+    matchers = build_matchers(
+        args.primer, args.mismatches, args.min_partial, not args.no_revcomp, args.engine
+    )
+    stage_matchers = {
+        "complete": matchers[0],
+        "partial": matchers[1],
+    }
+    if args.alignment:
+        stage_matchers["alignment"] = AlignmentMatcher(
+            deambiguate_primers(args.primer),
+            None,
+            args.align_id,
+            backend=args.aligner,
+        )
+
+    results = {
+        "num_reads": args.num_reads,
+        "stages": {},
+    }
+    for _ in range(args.repeat):
+        stage_times = time_stages(fastq.getvalue(), stage_matchers)
+        for stage, seconds in stage_times.items():
+            best_seconds = results["stages"].get(stage, {}).get("seconds")
+            if (best_seconds is None) or (seconds < best_seconds):
+                results["stages"][stage] = {
+                    "seconds": seconds,
+                    "reads_per_sec": args.num_reads / seconds if seconds else None,
+                }
+    results["peak_rss_mb"] = peak_rss_mb()
+
+    write_results(sys.stdout, results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        for stage, ratio in regressions:
+            sys.stderr.write(
+                "Regression in {0} stage: {1:.0%} of baseline reads/sec\n".format(
+                    stage, ratio
+                )
+            )
+        if regressions:
+            p.exit(1)
+
+
+def simulate_reads(
+    primers,
+    num_reads,
+    read_length,
+    primer_fraction=0.5,
+    primer_start_range=(0, None),
+    mismatch_rate=0.0,
+    revcomp_fraction=0.0,
+    seed=0,
+):
+    """Simulate reads, some of which contain a primer sequence
+
+    Degenerate primer bases are resolved at random for each read.
+    The primer replaces the read bases where it is placed, and is cut
+    off if it runs past the end of the read.
+    """
+    rng = random.Random(seed)
+    min_start, max_start = primer_start_range
+    if max_start is None:
+        max_start = read_length
+    if not (0 <= min_start <= max_start <= read_length):
+        raise ValueError("Invalid primer start range: {}".format(primer_start_range))
+    qual = "I" * read_length
+    for n in range(num_reads):
+        seq = rng.choices("ACGT", k=read_length)
+        if rng.random() < primer_fraction:
+            primer = simulate_primer(rng, rng.choice(primers), mismatch_rate)
+            if rng.random() < revcomp_fraction:
+                primer = reverse_complement(primer)
+            start_idx = rng.randint(min_start, max_start)
+            end_idx = min(start_idx + len(primer), read_length)
+            seq[start_idx:end_idx] = primer[: end_idx - start_idx]
+        yield "read{0}".format(n), "".join(seq), qual
+
+
+def simulate_primer(rng, primer, mismatch_rate):
+    bases = []
+    for base in primer:
+        base = rng.choice(AMBIGUOUS_BASES[base])
+        if rng.random() < mismatch_rate:
+            base = rng.choice([b for b in "ACGT" if b != base])
+        bases.append(base)
+    return "".join(bases)
+
+
+def time_stages(fastq, stage_matchers):
+    """Time each stage of trimming, in seconds
+
+    Matchers are applied in order, each to the reads left unmatched
+    by the previous stages, as in the main program.
+    """
+    stage_times = {}
+
+    start_time = time.perf_counter()
+    trimmable_reads = TrimmableReads(parse_fastq(io.StringIO(fastq)))
+    stage_times["parse"] = time.perf_counter() - start_time
+
+    for stage, matcher in stage_matchers.items():
+        start_time = time.perf_counter()
+        trimmable_reads.apply_matchers([matcher])
+        stage_times[stage] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    write_fastq(io.StringIO(), trimmable_reads.output_reads())
+    write_log(io.StringIO(), trimmable_reads.output_loginfo())
+    stage_times["write"] = time.perf_counter() - start_time
+
+    return stage_times
+
+
+def write_results(f, results):
+    f.write("stage\tseconds\treads_per_sec\n")
+    for stage, stage_results in results["stages"].items():
+        f.write(
+            "{0}\t{1:.3f}\t{2:.0f}\n".format(
+                stage,
+                stage_results["seconds"],
+                stage_results["reads_per_sec"] or float("inf"),
+            )
+        )
+    if results["peak_rss_mb"] is not None:
+        f.write("peak_rss_mb\t{0:.1f}\n".format(results["peak_rss_mb"]))
+
+
+def compare_results(results, baseline, tolerance=0.2):
+    """Find stages that are slower than the baseline
+
+    Returns a list of (stage, ratio of reads per second to the
+    baseline) for each stage that slowed down by more than the
+    tolerance.  Stages missing from either set of results are skipped.
+    """
+    regressions = []
+    for stage, stage_results in results["stages"].items():
+        baseline_results = baseline["stages"].get(stage)
+        if baseline_results is None:
+            continue
+        rate = stage_results["reads_per_sec"]
+        baseline_rate = baseline_results["reads_per_sec"]
+        if (rate is None) or (not baseline_rate):
+            continue
+        ratio = rate / baseline_rate
+        if ratio < 1 - tolerance:
+            regressions.append((stage, ratio))
+    return regressions
@@ -0,0 +1,240 @@
+import collections
+
+from .dna import AMBIGUOUS_BASES, COMPLEMENT_BASES, MISMATCH_RANKS
+from .matcher import CompleteMatcher, Matcher, PrimerMatch
+
+# A primer is kept in its degenerate form.  For each position, choices
+# holds the bases allowed, in the order that deambiguate() would
+# produce them.  The variants produced by deambiguate() are ordered
+# by the choice made at each position, in choice_order.
+DegenerateQuery = collections.namedtuple(
+    "DegenerateQuery", ["seq", "choices", "choice_order"]
+)
+
+
+def degenerate_queries(primers, match_reverse_complement=True):
+    primers = list(primers)
+    queries = [
+        DegenerateQuery(
+            primer, [AMBIGUOUS_BASES[c] for c in primer], tuple(range(len(primer)))
+        )
+        for primer in primers
+    ]
+    if match_reverse_complement:
+        # The reverse complement of each variant is taken in the order
+        # of the variants of the forward primer.
+        for primer in primers:
+            rc_seq = "".join(COMPLEMENT_BASES[c] for c in reversed(primer))
+            choices = [
+                "".join(COMPLEMENT_BASES[b] for b in AMBIGUOUS_BASES[c])
+                for c in reversed(primer)
+            ]
+            choice_order = tuple(reversed(range(len(primer))))
+            queries.append(DegenerateQuery(rc_seq, choices, choice_order))
+    return queries
+
+
+def variant_index(query, seq, start_idx):
+    """Position of the best matching variant in the deambiguated query
+
+    The variant is given as the tuple of choices made at each position.
+    Where the read base is allowed, that base is chosen, otherwise the
+    first base is chosen.  Query positions that fall outside the read
+    also take the first base.
+    """
+    idxs = []
+    for query_idx in query.choice_order:
+        seq_idx = start_idx + query_idx
+        if 0 <= seq_idx < len(seq):
+            idxs.append(max(query.choices[query_idx].find(seq[seq_idx]), 0))
+        else:
+            idxs.append(0)
+    return tuple(idxs)
+
+
+class BitMasks:
+    """Bit masks for a set of degenerate queries, placed end to end
+
+    Bit n of each base mask is set if the base is allowed at that
+    position.  Any other character in a read, such as N, is not
+    allowed anywhere.
+    """
+
+    def __init__(self, queries):
+        self.offsets = []
+        self.base_masks = dict.fromkeys("ACGT", 0)
+        self.start_mask = 0
+        self.end_mask = 0
+        # Query index for the last bit of each query
+        self.query_ends = {}
+        offset = 0
+        for query_idx, query in enumerate(queries):
+            self.offsets.append(offset)
+            for pos, bases in enumerate(query.choices):
+                for base in bases:
+                    self.base_masks[base] |= 1 << (offset + pos)
+            if query.choices:
+                self.start_mask |= 1 << offset
+                self.end_mask |= 1 << (offset + len(query.choices) - 1)
+                self.query_ends[offset + len(query.choices) - 1] = query_idx
+            offset += len(query.choices)
+
+    def iter_hits(self, hits):
+        """Yield the query index for each bit set at the end of a query"""
+        while hits:
+            low_bit = hits & -hits
+            yield self.query_ends[low_bit.bit_length() - 1]
+            hits ^= low_bit
+
+
+class BitParallelCompleteMatcher(CompleteMatcher):
+    """Find complete primer matches without expanding degenerate bases
+
+    Each read is scanned once with the Shift-And algorithm, keeping
+    one bit vector for each number of mismatches.  Matches are ranked
+    exactly as CompleteMatcher would rank them for the deambiguated
+    primers, so the results are the same.
+    """
+
+    def __init__(
+        self,
+        primers,
+        max_mismatch,
+        match_reverse_complement=True,
+        discard_before=None,
+    ):
+        self.queries = degenerate_queries(primers, match_reverse_complement)
+        self.queryset = [q.seq for q in self.queries]
+        self.max_mismatch = max_mismatch
+        self.discard_before = discard_before
+        self.max_query_len = max((len(q) for q in self.queryset), default=0)
+        self.masks = BitMasks(self.queries)
+
+    def _iter_candidates(self, seq):
+        base_masks = self.masks.base_masks
+        start_mask = self.masks.start_mask
+        end_mask = self.masks.end_mask
+        # Bit n of states[k] is set if the query prefix ending at bit n
+        # matches the read ending at the current base, with k or fewer
+        # mismatches.
+        states = [0] * (self.max_mismatch + 1)
+        for end_idx, base in enumerate(seq):
+            base_mask = base_masks.get(base, 0)
+            prev_shifted = 0
+            for k, state in enumerate(states):
+                shifted = (state << 1) | start_mask
+                states[k] = (shifted & base_mask) | prev_shifted
+                prev_shifted = shifted
+            hits = states[-1] & end_mask
+            if hits:
+                for query_idx in self.masks.iter_hits(hits):
+                    query_len = len(self.queryset[query_idx])
+                    yield query_idx, end_idx + 1 - query_len
+
+    def _rank_candidate(self, seq, query_idx, start_idx):
+        # Rank as the best deambiguated variant of the query would be
+        # ranked by CompleteMatcher.  The variant index is placed with
+        # the mismatch positions, after the query index.
+        query = self.queries[query_idx]
+        mismatch_idxs = []
+        for idx, bases in enumerate(query.choices):
+            if seq[start_idx + idx] not in bases:
+                mismatch_idxs.append(idx)
+                if len(mismatch_idxs) > self.max_mismatch:
+                    return None
+        observed_bases = [seq[start_idx + idx] for idx in mismatch_idxs]
+        if all(b == "N" for b in observed_bases):
+            variant_rank = 0
+        else:
+            variant_rank = 1
+            for idx, observed_base in zip(mismatch_idxs, observed_bases):
+                mismatch_ranks = MISMATCH_RANKS[query.choices[idx][0]]
+                if observed_base not in mismatch_ranks:
+                    return None
+                variant_rank = (
+                    (variant_rank - 1) * 3 + mismatch_ranks[observed_base] + 1
+                )
+        return (
+            len(mismatch_idxs),
+            query_idx,
+            (variant_index(query, seq, start_idx), tuple(mismatch_idxs)),
+            variant_rank,
+            start_idx,
+        )
+
+
+class BitParallelPartialMatcher(Matcher):
+    """Find partial primer matches without expanding degenerate bases
+
+    The start of each read is compared to every suffix of every primer
+    at once, by setting a bit at the start of each suffix and shifting
+    the bits along the read.  The end of the read is compared to the
+    prefixes of the primers in the same way, using the reversed read
+    and primers.  Results are the same as for PartialMatcher.
+    """
+
+    stage = "partial"
+
+    def __init__(self, primers, min_length, match_reverse_complement=True):
+        self.min_length = min_length
+        self.queries = degenerate_queries(primers, match_reverse_complement)
+        self.queryset = [q.seq for q in self.queries]
+        self.left_masks, self.left_starts = self._build_masks(self.queries)
+        reversed_queries = [
+            DegenerateQuery(q.seq[::-1], q.choices[::-1], q.choice_order)
+            for q in self.queries
+        ]
+        self.right_masks, self.right_starts = self._build_masks(reversed_queries)
+
+    def _build_masks(self, queries):
+        masks = BitMasks(queries)
+        # Partial matches start at position 1 or later in the query,
+        # and are at least min_length long.
+        start_bits = 0
+        for query, offset in zip(queries, masks.offsets):
+            for start_idx in range(1, len(query.choices) - self.min_length + 1):
+                start_bits |= 1 << (offset + start_idx)
+        return masks, start_bits
+
+    def _iter_prefix_hits(self, masks, start_bits, seq):
+        # Yields the query index and length of each query suffix that
+        # matches the start of the sequence exactly.
+        state = start_bits
+        for idx, base in enumerate(seq):
+            state &= masks.base_masks.get(base, 0)
+            if not state:
+                return
+            hits = state & masks.end_mask
+            if hits:
+                for query_idx in masks.iter_hits(hits):
+                    yield query_idx, idx + 1
+            state = (state & ~masks.end_mask) << 1
+
+    def find_match(self, seq):
+        # PartialMatcher takes the first deambiguated variant with a
+        # match, then the longest match for that variant.
+        best = None
+        for query_idx, match_len in self._iter_prefix_hits(
+            self.left_masks, self.left_starts, seq
+        ):
+            query = self.queries[query_idx]
+            start_idx = match_len - len(query.seq)
+            rank = (query_idx, variant_index(query, seq, start_idx), -match_len)
+            if (best is None) or (rank < best):
+                best = rank
+        if best is not None:
+            match_len = -best[-1]
+            return PrimerMatch("Partial", 0, 0, seq[:match_len])
+
+        for query_idx, match_len in self._iter_prefix_hits(
+            self.right_masks, self.right_starts, reversed(seq)
+        ):
+            query = self.queries[query_idx]
+            start_idx = len(seq) - match_len
+            rank = (query_idx, variant_index(query, seq, start_idx), -match_len)
+            if (best is None) or (rank < best):
+                best = rank
+        if best is not None:
+            match_len = -best[-1]
+            start_idx = len(seq) - match_len
+            return PrimerMatch("Partial", start_idx, 0, seq[start_idx:])
@@ -0,0 +1,46 @@
+import hashlib
+import importlib.metadata
+import json
+import os
+import pickle
+import tempfile
+
+
+def package_version():
+    try:
+        return importlib.metadata.version("primertrim")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def cache_key(key_data):
+    """Hash JSON-serializable key data, together with the package version"""
+    key_json = json.dumps([package_version(), key_data], sort_keys=True)
+    return hashlib.sha256(key_json.encode("utf-8")).hexdigest()
+
+
+def load_or_build(cache_dir, key_data, build):
+    """Load an object from the cache, or build it and save it in the cache
+
+    Objects are stored as pickle files named by a hash of the key data
+    and the package version, so upgrading the package invalidates the
+    cache.  Unreadable cache files are rebuilt.
+    """
+    fp = os.path.join(cache_dir, cache_key(key_data) + ".pickle")
+    try:
+        with open(fp, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        pass
+
+    obj = build()
+
+    # Many processes may share the cache, so we write to a temporary
+    # file and move it into place in one step.
+    os.makedirs(cache_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        "wb", dir=cache_dir, suffix=".tmp", delete=False
+    ) as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f.name, fp)
+    return obj
@@ -0,0 +1,60 @@
+import json
+import os
+
+
+def resume_from_checkpoint(fp, run_key, record_range):
+    """Read the state of an earlier run and prepare to continue it
+
+    The run key identifies the input files and options of the run.
+    Output files are cut back to their size at the checkpoint.
+    Returns None if there is no checkpoint.
+    """
+    if not os.path.exists(fp):
+        return None
+    with open(fp) as f:
+        state = json.load(f)
+    if state.get("run_key") != run_key:
+        raise ValueError(
+            "Checkpoint is for a run with different input files or options: "
+            "{}".format(fp)
+        )
+    if state["record_range"] != list(record_range):
+        raise ValueError(
+            "Checkpoint is for a different range of records: {}".format(fp)
+        )
+    for output_fp, size in state["output_sizes"].items():
+        os.truncate(output_fp, size)
+    return state
+
+
+def write_checkpoint(fp, run_key, record_range, records_done, output_fps, summaries):
+    """Record the progress of a run after a chunk of reads is written
+
+    The output files must be flushed first.  We save their sizes, so
+    that anything written after the checkpoint can be removed when the
+    run is resumed.  The checkpoint file is replaced in one step, so it
+    is never left half written.
+    """
+    start, stop = record_range
+    state = {
+        "run_key": run_key,
+        "record_range": [start, stop],
+        "records_done": records_done,
+        "output_sizes": {
+            output_fp: os.path.getsize(output_fp)
+            for output_fp in output_fps
+            if output_fp
+        },
+        "summaries": [summary.to_dict() for summary in summaries],
+    }
+    temp_fp = fp + ".tmp"
+    with open(temp_fp, "w") as f:
+        json.dump(state, f, indent=2)
+        f.write("\n")
+    os.replace(temp_fp, fp)
+
+
+def remove_checkpoint(fp):
+    """Remove the checkpoint once the run is finished"""
+    if os.path.exists(fp):
+        os.remove(fp)
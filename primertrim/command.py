@@ -1,15 +1,61 @@
 import argparse
+import collections
+import cProfile
+import io
+import itertools
 import os
-import sys
-import tempfile
 
-from .trimmable_reads import TrimmableReads
+from .trimmable_reads import chunk_reads, passes_filters, zip_mates
 from .matcher import (
-    CompleteMatcher,
-    PartialMatcher,
     AlignmentMatcher,
+    MemoizedMatcher,
+    ShortReadMatcher,
+    WindowedMatcher,
+    ALIGNMENT_BACKENDS,
 )
-from .dna import deambiguate
+from .cache import cache_key, load_or_build
+from .checkpoint import remove_checkpoint, resume_from_checkpoint, write_checkpoint
+from .compression import (
+    COMPRESSION_TYPES,
+    compression_from_filename,
+    open_input,
+    open_output,
+)
+from .engines import MATCHING_ENGINES, build_matchers, deambiguate_primers
+from .fastq import write_fastq
+from .fastq_index import (
+    count_records,
+    load_index,
+    parse_fastq_range,
+    parse_record_range,
+    parse_shard,
+    shard_range,
+)
+from .logfile import (
+    LOG_FORMATS,
+    LogSummary,
+    log_format_from_filename,
+    open_log_writer,
+)
+from .parallel import DEFAULT_PARALLEL_CHUNK_SIZE, match_chunks, match_chunk_sets
+from .pipeline import run_stages
+from .quality import QUALITY_METHODS, QualityTrimmer
+from .stats import RunStats
+
+# Options that change how a run is carried out, but not its output
+RUN_CONTROL_OPTIONS = {
+    "checkpoint",
+    "stats",
+    "profile",
+    "jobs",
+    "pipeline",
+    "threads",
+    "compress_threads",
+    "chunk_size",
+    "cache_dir",
+    "alignment_dir",
+    "dedup_cache_size",
+}
 
 
 def main(argv=None):
@@ -31,13 +77,235 @@ def main(argv=None):
         "--log",
         help="Log file of primers and location (default: not written)",
     )
+    io_group.add_argument(
+        "--log-summary",
+        help=(
+            "Summary of the log in JSON format, with the number of reads "
+            "for each match type, number of mismatches, and observed "
+            "primer (default: not written)"
+        ),
+    )
+
+    paired_group = p.add_argument_group("Paired-end reads")
+    paired_group.add_argument(
+        "--input-fastq-r2",
+        help=(
+            "Input FASTQ file of R2 reads. If given, the input FASTQ file "
+            "contains the R1 reads, and read pairs are trimmed together"
+        ),
+    )
+    paired_group.add_argument(
+        "--output-fastq-r2",
+        help="Output FASTQ file of R2 reads after trimming",
+    )
+    paired_group.add_argument(
+        "--log-r2",
+        help="Log file of primers and location in R2 reads (default: not written)",
+    )
+    paired_group.add_argument(
+        "--log-summary-r2",
+        help="Summary of the log for R2 reads (default: not written)",
+    )
+    paired_group.add_argument(
+        "--reverse-primer",
+        action="append",
+        help=(
+            "Primer sequence to be trimmed from R2 reads. Can be given "
+            "more than once (default: same as the primers trimmed from "
+            "R1 reads)"
+        ),
+    )
+    add_trimming_arguments(p, io_group)
+
+    records_group = p.add_argument_group("Partial runs")
+    range_group = records_group.add_mutually_exclusive_group()
+    range_group.add_argument(
+        "--records",
+        type=parse_record_range,
+        help=(
+            "Trim only the records in this range, counting from 1, e.g. "
+            "1000001-2000000. Either end may be left out. If the input "
+            "file was indexed with ptrim-index, we skip directly to the "
+            "first record (default: all records)"
+        ),
+    )
+    range_group.add_argument(
+        "--shard",
+        type=parse_shard,
+        help=(
+            "Split the input into N parts of nearly equal size and trim "
+            "only part K, given as K/N. The output files for parts 1 to "
+            "N can be concatenated in order (default: all records)"
+        ),
+    )
+    records_group.add_argument(
+        "--checkpoint",
+        help=(
+            "Save progress to this file after each chunk of reads is "
+            "written. If the file already exists, the run is resumed "
+            "after the last chunk that was written. Requires output "
+            "files, which may be gzip compressed, and tab-separated log "
+            "files (default: no checkpoints)"
+        ),
+    )
+
+    diagnostics_group = p.add_argument_group("Diagnostics")
+    diagnostics_group.add_argument(
+        "--stats",
+        help=(
+            "Write statistics for the run to a JSON file, including the "
+            "time spent and reads processed in each stage, the number of "
+            "reads matched by each method, and peak memory use "
+            "(default: not written)"
+        ),
+    )
+    diagnostics_group.add_argument(
+        "--profile",
+        help=(
+            "Run the main process under cProfile, and write the profile "
+            "to a file that can be read with the pstats module "
+            "(default: not profiled)"
+        ),
+    )
+    args = p.parse_args(argv)
+    check_trimming_arguments(p, args)
+
+    if args.input_fastq_r2 is not None:
+        if (args.input_fastq is None) or (args.output_fastq is None):
+            p.error("Paired-end reads require --input-fastq and --output-fastq")
+        if args.output_fastq_r2 is None:
+            p.error("Paired-end reads require --output-fastq-r2")
+    if (args.shard is not None) and (args.input_fastq is None):
+        p.error("--shard requires --input-fastq")
+    if args.checkpoint:
+        output_fps = [args.output_fastq, args.output_fastq_r2]
+        if args.output_fastq is None:
+            p.error("--checkpoint requires --output-fastq")
+        compressions = [
+            args.compress or compression_from_filename(fp) for fp in output_fps if fp
+        ]
+        log_fps = [fp for fp in [args.log, args.log_r2] if fp]
+        compressions += [compression_from_filename(fp) for fp in log_fps]
+        if "zstd" in compressions:
+            p.error("--checkpoint does not support zstd compressed output")
+        log_formats = [
+            args.log_format or log_format_from_filename(fp) for fp in log_fps
+        ]
+        if "parquet" in log_formats:
+            p.error("--checkpoint does not support Parquet log files")
+
+    stats = RunStats()
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.runcall(run, args, stats)
+        profiler.dump_stats(args.profile)
+    else:
+        run(args, stats)
+
+    if args.stats:
+        with open(args.stats, "w") as f:
+            stats.write(f)
+
+
+def run(args, stats):
+    with stats.time_stage("build_matchers"):
+        matchers = get_matchers(args, args.primer)
+        alignment_matchers = get_alignment_matchers(args, args.primer)
+    record_range = get_record_range(args)
+    if args.input_fastq_r2 is None:
+        trim_fastq(
+            args,
+            matchers,
+            alignment_matchers,
+            args.input_fastq,
+            args.output_fastq,
+            args.log,
+            args.log_summary,
+            stats=stats,
+            record_range=record_range,
+            checkpoint_fp=args.checkpoint,
+        )
+        return
+
+    if args.reverse_primer:
+        with stats.time_stage("build_matchers"):
+            matchers_r2 = get_matchers(args, args.reverse_primer)
+            alignment_matchers_r2 = get_alignment_matchers(args, args.reverse_primer)
+    else:
+        matchers_r2 = matchers
+        alignment_matchers_r2 = alignment_matchers
+    trim_paired_fastq(
+        args,
+        [matchers, matchers_r2],
+        [alignment_matchers, alignment_matchers_r2],
+        [args.input_fastq, args.input_fastq_r2],
+        [args.output_fastq, args.output_fastq_r2],
+        [args.log, args.log_r2],
+        [args.log_summary, args.log_summary_r2],
+        stats=stats,
+        record_range=record_range,
+        checkpoint_fp=args.checkpoint,
+    )
+
+
+def get_record_range(args):
+    """Start and stop of the records to be trimmed"""
+    if args.records is not None:
+        return args.records
+    if args.shard is not None:
+        shard, num_shards = args.shard
+        return shard_range(shard, num_shards, count_records(args.input_fastq))
+    return (0, None)
+
+
+def add_trimming_arguments(p, io_group):
+    """Add options for trimming, shared by the ptrim and ptrim-batch commands"""
+    io_group.add_argument(
+        "--compress",
+        choices=COMPRESSION_TYPES,
+        help=(
+            "Compression format of the output FASTQ file. Compressed input "
+            "files are detected automatically (default: determined from "
+            "the output file extension, .gz, .bgz, or .zst)"
+        ),
+    )
+    io_group.add_argument(
+        "--compress-threads",
+        type=int,
+        default=1,
+        help=(
+            "Number of background threads used to compress the output "
+            "FASTQ file (default: %(default)s)"
+        ),
+    )
+    io_group.add_argument(
+        "--log-format",
+        choices=LOG_FORMATS,
+        help=(
+            "Format of the log file. Parquet files are much smaller, and "
+            "require the pyarrow package. Tab-separated log files are "
+            "compressed if the filename ends in .gz or .zst (default: "
+            "parquet if the filename ends in .parquet, otherwise tsv)"
+        ),
+    )
     io_group.add_argument(
         "--min-length",
         type=int,
         default=50,
         help=(
             "Minimum length of reads written to the output FASTQ file. "
-            "(default: %(default)s)"
+            "Reads that are shorter to begin with are not searched for "
+            "primers, and are logged as 'Too short' (default: %(default)s)"
+        ),
+    )
+    io_group.add_argument(
+        "--chunk-size",
+        type=int,
+        help=(
+            "Number of reads to trim at a time. Trimmed reads and log "
+            "entries are written as each chunk is finished, so memory use "
+            "does not grow with the size of the input file "
+            "(default: trim all reads at once)"
         ),
     )
 
@@ -68,14 +336,120 @@ def main(argv=None):
             "(default: %(default)s)"
         ),
     )
+    complete_group.add_argument(
+        "--stop-at-short-match",
+        action="store_true",
+        help=(
+            "During the complete matching stage, stop searching a read "
+            "once a match is found that would trim it below the minimum "
+            "length. The read is discarded, even if a better match would "
+            "have been found later in the read"
+        ),
+    )
+    complete_group.add_argument(
+        "--engine",
+        choices=MATCHING_ENGINES,
+        default="python",
+        help=(
+            "Implementation of the complete and partial matching stages. "
+            "The numpy engine compares each primer to a batch of reads at "
+            "once, and requires the numpy package. The bitparallel engine "
+            "matches degenerate primers without expanding them into every "
+            "variant. The adaptive engine learns which primer variants "
+            "match most often, and looks for those first (default: "
+            "%(default)s)"
+        ),
+    )
+    complete_group.add_argument(
+        "--cache-dir",
+        help=(
+            "Directory in which to cache the matchers for the complete and "
+            "partial matching stages, e.g. ~/.cache/primertrim. Matchers "
+            "are built once for each set of primers and options, then "
+            "re-used in later runs (default: matchers are not cached)"
+        ),
+    )
+    complete_group.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help=(
+            "Number of worker processes to use during the complete and "
+            "partial matching stages. Reads are split into chunks, which "
+            "are matched in parallel (default: %(default)s)"
+        ),
+    )
+    complete_group.add_argument(
+        "--pipeline",
+        action="store_true",
+        help=(
+            "Run reading, matching, alignment, and writing at the same "
+            "time in separate threads, passing chunks of reads between "
+            "them. Reads are written in the same order as the input"
+        ),
+    )
+    complete_group.add_argument(
+        "--dedup-cache-size",
+        type=int,
+        default=0,
+        help=(
+            "Number of distinct read sequences for which match results "
+            "are remembered in each stage. Reads with the same sequence "
+            "as a remembered read are not matched again. Useful for "
+            "amplicon data with many duplicate reads (default: off)"
+        ),
+    )
+
+    window_group = p.add_argument_group(
+        "Search window",
+        (
+            "Limit the complete and alignment matching stages to part of "
+            "each read. If several options are given, only the bases "
+            "allowed by all of them are searched."
+        ),
+    )
+    window_group.add_argument(
+        "--search-start",
+        type=int,
+        default=0,
+        help=(
+            "Position in the read where the search window starts, counting "
+            "from zero. To find read-through into the reverse primer, use "
+            "a little less than the length of the amplicon "
+            "(default: %(default)s)"
+        ),
+    )
+    window_group.add_argument(
+        "--search-end",
+        type=int,
+        help="Position in the read where the search window ends (default: end of read)",
+    )
+    window_group.add_argument(
+        "--search-last",
+        type=int,
+        help="Search only the last N bases of each read (default: whole read)",
+    )
 
     alignment_group = p.add_argument_group("Alignment matching stage")
     alignment_group.add_argument(
         "--alignment", action="store_true", help="Activate the alignment matching stage"
     )
+    alignment_group.add_argument(
+        "--aligner",
+        choices=ALIGNMENT_BACKENDS,
+        default="vsearch",
+        help=(
+            "Program used in the alignment stage. The builtin aligner "
+            "requires NumPy, but not vsearch (default: %(default)s)"
+        ),
+    )
     alignment_group.add_argument(
         "--alignment-dir",
-        help="Directory for alignment files (default: temp directory)",
+        help=(
+            "Directory to keep alignment files for inspection (default: "
+            "reads are sent to vsearch through a pipe, and no alignment "
+            "files are kept)"
+        ),
     )
     alignment_group.add_argument(
         "--threads",
@@ -94,66 +468,395 @@ def main(argv=None):
             "(default: %(default)s)"
         ),
     )
-    args = p.parse_args(argv)
 
-    if args.input_fastq is None:
-        input_fastq = sys.stdin
-    else:
-        input_fastq = open(args.input_fastq, "r")
+    quality_group = p.add_argument_group("Quality trimming")
+    quality_group.add_argument(
+        "--quality-cutoff",
+        type=int,
+        help=(
+            "After removing primers, trim low quality bases from the 3' "
+            "end of each read, using this quality score as the cutoff "
+            "(default: reads are not trimmed for quality)"
+        ),
+    )
+    quality_group.add_argument(
+        "--quality-method",
+        choices=QUALITY_METHODS,
+        default="mott",
+        help=(
+            "Method of quality trimming. The mott method, as in BWA and "
+            "cutadapt, cuts where the sum of the cutoff minus each "
+            "quality score, counted from the 3' end, is highest. The "
+            "window method, as in Trimmomatic, cuts at the first window "
+            "of bases with mean quality below the cutoff (default: "
+            "%(default)s)"
+        ),
+    )
+    quality_group.add_argument(
+        "--quality-window",
+        type=int,
+        default=4,
+        help="Window size for the window method (default: %(default)s)",
+    )
+    quality_group.add_argument(
+        "--phred-offset",
+        type=int,
+        default=33,
+        help="Offset of quality scores in the FASTQ file (default: %(default)s)",
+    )
+    quality_group.add_argument(
+        "--max-n",
+        type=int,
+        help=(
+            "Maximum number of N bases in reads written to the output "
+            "FASTQ file, after trimming (default: no maximum)"
+        ),
+    )
+
+
+def check_trimming_arguments(p, args):
+    """Check the options added by add_trimming_arguments"""
+    for option in ["search_start", "search_end", "search_last"]:
+        val = getattr(args, option)
+        if (val is not None) and (val < 0):
+            p.error("--{} cannot be negative".format(option.replace("_", "-")))
+    if args.stop_at_short_match and (args.search_last is not None):
+        # The search window would start at a different position in
+        # each read, so the point where matches are too short would
+        # move with it.
+        p.error("--stop-at-short-match cannot be used with --search-last")
+
+
+def get_discard_before(args):
+    """Position in the search window before which a match ends the search
+
+    The complete matcher sees only the search window, so the minimum
+    length is counted from the start of the window.
+    """
+    if not args.stop_at_short_match:
+        return None
+    discard_before = args.min_length - args.search_start
+    if discard_before <= 0:
+        return None
+    return discard_before
 
-    if args.output_fastq is None:
-        output_fastq = sys.stdout
+
+def get_quality_trimmer(args):
+    if args.quality_cutoff is None:
+        return None
+    return QualityTrimmer(
+        args.quality_cutoff,
+        args.quality_method,
+        args.quality_window,
+        args.phred_offset,
+    )
+
+
+def get_matchers(args, primers):
+    """Build or load matchers for the complete and partial matching stages"""
+    matcher_args = (
+        primers,
+        args.mismatches,
+        args.min_partial,
+        not args.no_revcomp,
+        args.engine,
+        get_discard_before(args),
+    )
+    if args.cache_dir:
+        matchers = load_or_build(
+            args.cache_dir,
+            ["stage_matchers", *matcher_args],
+            lambda: build_matchers(*matcher_args),
+        )
     else:
-        output_fastq = open(args.output_fastq, "w")
+        matchers = build_matchers(*matcher_args)
+    matchers = [_wrap_matcher(args, m) for m in matchers]
+    if args.min_length > 0:
+        # Reads that are already too short are not searched for primers
+        matchers.insert(0, ShortReadMatcher(args.min_length))
+    return matchers
+
+
+def get_alignment_matchers(args, primers):
+    if not args.alignment:
+        return []
+    queryset = deambiguate_primers(primers)
+    if args.alignment_dir and not os.path.exists(args.alignment_dir):
+        os.mkdir(args.alignment_dir)
+    am = AlignmentMatcher(
+        queryset, args.alignment_dir, args.align_id, args.threads, args.aligner
+    )
+    return [_wrap_matcher(args, am)]
+
+
+def _wrap_matcher(args, matcher):
+    if args.dedup_cache_size > 0:
+        matcher = MemoizedMatcher(matcher, args.dedup_cache_size)
+    # The partial matching stage looks only at the ends of the read,
+    # so it is not limited to the search window.
+    has_window = (
+        (args.search_start > 0)
+        or (args.search_end is not None)
+        or (args.search_last is not None)
+    )
+    if has_window and (matcher.stage != "partial"):
+        matcher = WindowedMatcher(
+            matcher, args.search_start, args.search_end, args.search_last
+        )
+    return matcher
+
+
+def trim_fastq(
+    args,
+    matchers,
+    alignment_matchers,
+    input_fp=None,
+    output_fp=None,
+    log_fp=None,
+    summary_fp=None,
+    stats=None,
+    record_range=(0, None),
+    checkpoint_fp=None,
+):
+    """Trim the reads in one FASTQ file
+
+    If the input or output filepaths are not given, we use standard
+    input or output.  If a RunStats object is given, statistics for
+    each stage are added to it.  Only the records in the given range
+    are trimmed.  If a checkpoint file is given, progress is saved
+    after each chunk, and the run resumes from the last checkpoint.
+    """
+    if stats is None:
+        stats = RunStats()
+    next_record, stop = record_range
+    summary = LogSummary()
+    state = None
+    if checkpoint_fp:
+        run_key = checkpoint_key(args, [input_fp])
+        state = resume_from_checkpoint(checkpoint_fp, run_key, record_range)
+    if state is not None:
+        next_record = state["records_done"]
+        summary = LogSummary.from_dict(state["summaries"][0])
+    input_fastq = open_input(input_fp)
+    output_fastq = _open_output_fastq(args, output_fp, state is not None)
+    log_writer = open_log_writer(log_fp, args.log_format, state is not None)
+
+    quality_trimmer = get_quality_trimmer(args)
+
+    reads = parse_fastq_range(input_fastq, next_record, stop, load_index(input_fp))
+    reads = stats.timed_iter("parse", reads)
+    chunks = _chunk_reads(args, reads, checkpoint_fp is not None)
+
+    def align_chunks(chunks):
+        # The alignment stage runs in the main process, so that
+        # vsearch can manage its own threads.
+        for trimmable_reads in chunks:
+            trimmable_reads.apply_matchers(alignment_matchers)
+            yield trimmable_reads
+
+    stages = [lambda chunks: match_chunks(chunks, matchers, args.jobs), align_chunks]
+    for trimmable_reads in run_stages(chunks, stages, args.pipeline):
+        stats.update(trimmable_reads.stats)
+        stats.match_counts.update(trimmable_reads.match_counts())
+
+        if quality_trimmer is not None:
+            with stats.time_stage("quality") as stage_stats:
+                stage_stats["reads_in"] += len(trimmable_reads)
+                stage_stats["reads_out"] += trimmable_reads.trim_quality(
+                    quality_trimmer
+                )
+
+        with stats.time_stage("write") as stage_stats:
+            output_reads = trimmable_reads.output_reads(args.min_length, args.max_n)
+            stage_stats["reads_in"] += len(trimmable_reads)
+            stage_stats["reads_out"] += write_fastq(output_fastq, output_reads)
+            _write_loginfo(trimmable_reads, log_writer, summary if summary_fp else None)
+
+        next_record += len(trimmable_reads)
+        if checkpoint_fp:
+            output_fastq.flush()
+            if log_writer is not None:
+                log_writer.flush()
+            write_checkpoint(
+                checkpoint_fp,
+                run_key,
+                record_range,
+                next_record,
+                [output_fp, log_fp],
+                [summary],
+            )
+
+    if input_fp is not None:
+        input_fastq.close()
+    output_fastq.close()
+    if log_writer is not None:
+        log_writer.close()
+    _write_summary(summary, summary_fp)
+    if checkpoint_fp:
+        remove_checkpoint(checkpoint_fp)
+
 
-    queryset = []
-    for ambiguous_primer in args.primer:
-        for unambiguous_primer in deambiguate(ambiguous_primer):
-            queryset.append(unambiguous_primer)
+def trim_paired_fastq(
+    args,
+    mate_matchers,
+    mate_alignment_matchers,
+    input_fps,
+    output_fps,
+    log_fps,
+    summary_fps=(None, None),
+    stats=None,
+    record_range=(0, None),
+    checkpoint_fp=None,
+):
+    """Trim the reads in a pair of R1 and R2 FASTQ files
 
-    matchers = [
-        CompleteMatcher(queryset, args.mismatches, not args.no_revcomp),
-        PartialMatcher(queryset, args.min_partial, not args.no_revcomp),
+    Each argument after args is a list with one entry for R1 and one
+    for R2.  Read pairs are written only if both reads are long enough
+    after trimming, so the output files stay in sync.  Statistics are
+    counted per read, adding together the R1 and R2 reads.
+    """
+    if stats is None:
+        stats = RunStats()
+    next_record, stop = record_range
+    summaries = [LogSummary() for _ in input_fps]
+    state = None
+    if checkpoint_fp:
+        run_key = checkpoint_key(args, input_fps)
+        state = resume_from_checkpoint(checkpoint_fp, run_key, record_range)
+    if state is not None:
+        next_record = state["records_done"]
+        summaries = [LogSummary.from_dict(vals) for vals in state["summaries"]]
+    input_fastqs = [open_input(fp) for fp in input_fps]
+    output_fastqs = [
+        _open_output_fastq(args, fp, state is not None) for fp in output_fps
     ]
+    log_writers = [
+        open_log_writer(fp, args.log_format, state is not None) for fp in log_fps
+    ]
+
+    quality_trimmer = get_quality_trimmer(args)
+
+    mate_reads = [
+        parse_fastq_range(f, next_record, stop, load_index(fp))
+        for f, fp in zip(input_fastqs, input_fps)
+    ]
+    pairs = stats.timed_iter("parse", zip_mates(mate_reads))
+    chunks = _chunk_reads(args, pairs, checkpoint_fp is not None)
+    chunk_sets = (list(zip(*chunk)) for chunk in chunks)
+
+    def align_chunk_sets(chunk_sets):
+        for mates in chunk_sets:
+            for trimmable_reads, alignment_matchers in zip(
+                mates, mate_alignment_matchers
+            ):
+                trimmable_reads.apply_matchers(alignment_matchers)
+            yield mates
+
+    stages = [
+        lambda chunk_sets: match_chunk_sets(chunk_sets, mate_matchers, args.jobs),
+        align_chunk_sets,
+    ]
+    for mates in run_stages(chunk_sets, stages, args.pipeline):
+        for trimmable_reads in mates:
+            stats.update(trimmable_reads.stats)
+            stats.match_counts.update(trimmable_reads.match_counts())
+
+        if quality_trimmer is not None:
+            with stats.time_stage("quality") as stage_stats:
+                for trimmable_reads in mates:
+                    stage_stats["reads_in"] += len(trimmable_reads)
+                    stage_stats["reads_out"] += trimmable_reads.trim_quality(
+                        quality_trimmer
+                    )
+
+        with stats.time_stage("write") as stage_stats:
+            # Decide which pairs to keep first, so that each file can be
+            # written in one pass without holding the trimmed reads.
+            trimmed_pairs = zip(*(t.trimmed_reads() for t in mates))
+            keep = [
+                all(
+                    passes_filters(seq, args.min_length, args.max_n)
+                    for _, seq, _ in pair
+                )
+                for pair in trimmed_pairs
+            ]
+            for output_fastq, trimmable_reads in zip(output_fastqs, mates):
+                output_reads = itertools.compress(trimmable_reads.trimmed_reads(), keep)
+                stage_stats["reads_out"] += write_fastq(output_fastq, output_reads)
+            stage_stats["reads_in"] += sum(len(t) for t in mates)
+
+            for log_writer, summary, summary_fp, trimmable_reads in zip(
+                log_writers, summaries, summary_fps, mates
+            ):
+                _write_loginfo(
+                    trimmable_reads, log_writer, summary if summary_fp else None
+                )
+
+        next_record += len(mates[0])
+        if checkpoint_fp:
+            for f in output_fastqs:
+                f.flush()
+            for log_writer in log_writers:
+                if log_writer is not None:
+                    log_writer.flush()
+            write_checkpoint(
+                checkpoint_fp,
+                run_key,
+                record_range,
+                next_record,
+                list(output_fps) + list(log_fps),
+                summaries,
+            )
+
+    for f in input_fastqs + output_fastqs:
+        f.close()
+    for log_writer in log_writers:
+        if log_writer is not None:
+            log_writer.close()
+    for summary, summary_fp in zip(summaries, summary_fps):
+        _write_summary(summary, summary_fp)
+    if checkpoint_fp:
+        remove_checkpoint(checkpoint_fp)
+
+
+def checkpoint_key(args, input_fps):
+    """Identify the input files and options of a run, for its checkpoint"""
+    options = {
+        key: val for key, val in vars(args).items() if key not in RUN_CONTROL_OPTIONS
+    }
+    input_paths = [os.path.abspath(fp) for fp in input_fps]
+    return cache_key(["checkpoint", input_paths, options])
+
+
+def _open_output_fastq(args, output_fp, append=False):
+    return io.TextIOWrapper(
+        open_output(output_fp, args.compress, args.compress_threads, append),
+        encoding="utf-8",
+    )
+
+
+def _write_loginfo(trimmable_reads, log_writer, summary):
+    """Write the log entries and update the summary, if either is needed"""
+    if (log_writer is None) and (summary is None):
+        return
+    loginfo = trimmable_reads.output_loginfo()
+    if summary is not None:
+        loginfo = summary.update_iter(loginfo)
+    if log_writer is None:
+        collections.deque(loginfo, maxlen=0)
+    else:
+        log_writer.write(loginfo)
+
+
+def _write_summary(summary, summary_fp):
+    if summary_fp:
+        with open(summary_fp, "w") as f:
+            summary.write(f)
+
 
-    if args.alignment:
-        if args.alignment_dir:
-            alignment_dir = args.alignment_dir
-            if not os.path.exists(alignment_dir):
-                os.mkdir(alignment_dir)
-        else:
-            temp_alignment_dir = tempfile.TemporaryDirectory()
-            alignment_dir = temp_alignment_dir.name
-        am = AlignmentMatcher(queryset, alignment_dir, args.align_id, args.threads)
-        matchers.append(am)
-
-    trimmable_reads = TrimmableReads.from_fastq(input_fastq)
-
-    for m in matchers:
-        unmatched_seqs = trimmable_reads.get_unmatched_seqs()
-        matches_found = m.find_in_seqs(unmatched_seqs)
-        for read_id, matchobj in matches_found:
-            if matchobj is not None:
-                trimmable_reads.register_match(read_id, matchobj)
-
-    output_reads = trimmable_reads.output_reads(args.min_length)
-    write_fastq(output_fastq, output_reads)
-
-    if args.log:
-        output_loginfo = trimmable_reads.output_loginfo()
-        with open(args.log, "w") as f:
-            write_log(f, output_loginfo, trimmable_reads.loginfo_colnames)
-
-
-def write_fastq(f, reads):
-    for desc, seq, qual in reads:
-        f.write("@{0}\n{1}\n+\n{2}\n".format(desc, seq, qual))
-
-
-def write_log(f, loginfo, colnames=None):
-    if colnames:
-        f.write("\t".join(colnames))
-        f.write("\n")
-    for vals in loginfo:
-        f.write("\t".join(str(v) if v is not None else "" for v in vals))
-        f.write("\n")
+def _chunk_reads(args, reads, chunked=False):
+    if args.chunk_size is not None:
+        return chunk_reads(reads, args.chunk_size)
+    if (args.jobs > 1) or args.pipeline or chunked:
+        return chunk_reads(reads, DEFAULT_PARALLEL_CHUNK_SIZE)
+    return [reads]
@@ -0,0 +1,197 @@
+import collections
+import concurrent.futures
+import gzip
+import io
+import os
+import struct
+import sys
+import zlib
+
+BUFFER_SIZE = 1024 * 1024
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Largest amount of data in one BGZF block, as in htslib
+BGZF_BLOCK_SIZE = 0xFF00
+BGZF_HEADER = struct.Struct("<4BI2BH2BHH")
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+COMPRESSION_EXTENSIONS = {
+    ".gz": "gzip",
+    ".bgz": "bgzf",
+    ".zst": "zstd",
+}
+
+COMPRESSION_TYPES = ["gzip", "bgzf", "zstd", "none"]
+
+
+def detect_compression(f):
+    """Detect the compression of a buffered binary file from magic bytes
+
+    Returns "gzip", "zstd", or "none".  The file position is not
+    changed.
+    """
+    magic = f.peek(len(ZSTD_MAGIC))[: len(ZSTD_MAGIC)]
+    if magic.startswith(GZIP_MAGIC):
+        return "gzip"
+    if magic.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return "none"
+
+
+def compression_from_filename(fp):
+    _, ext = os.path.splitext(fp)
+    return COMPRESSION_EXTENSIONS.get(ext.lower(), "none")
+
+
+def open_input(fp=None):
+    """Open a FASTQ file for reading as a binary stream
+
+    Gzip (including bgzip) and zstd compressed files are decompressed
+    automatically.  If no filepath is given, we read from standard
+    input.
+    """
+    if fp is None:
+        f = sys.stdin.buffer
+    else:
+        f = open(fp, "rb", buffering=BUFFER_SIZE)
+    compression = detect_compression(f)
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=f, mode="rb")
+    if compression == "zstd":
+        zstandard = _import_zstandard()
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            f, read_size=BUFFER_SIZE, read_across_frames=True
+        )
+        return io.BufferedReader(reader, buffer_size=BUFFER_SIZE)
+    return f
+
+
+def open_output(fp=None, compression=None, threads=1, append=False):
+    """Open a FASTQ file for writing as a binary stream
+
+    If the compression is not given, it is determined from the file
+    extension.  BGZF output can be indexed by htslib and tabix.  If no
+    filepath is given, we write to standard output.  Closing the stream
+    finishes the compressed data, but leaves standard output open.  If
+    appending to a gzip file, the new data is written as additional gzip
+    members.
+    """
+    if compression is None:
+        compression = "none" if fp is None else compression_from_filename(fp)
+    if compression not in COMPRESSION_TYPES:
+        raise ValueError("Unknown compression type: {}".format(compression))
+
+    if fp is None:
+        sys.stdout.flush()
+        f = open(sys.stdout.fileno(), "wb", buffering=BUFFER_SIZE, closefd=False)
+    else:
+        f = open(fp, "ab" if append else "wb", buffering=BUFFER_SIZE)
+
+    if compression == "gzip":
+        return ParallelGzipWriter(f, threads)
+    if compression == "bgzf":
+        return ParallelGzipWriter(f, threads, bgzf=True)
+    if compression == "zstd":
+        zstandard = _import_zstandard()
+        compressor = zstandard.ZstdCompressor(threads=threads)
+        return compressor.stream_writer(f)
+    return f
+
+
+def _import_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            "The zstandard package is required for zstd compression. "
+            "Install it with: pip install primertrim[zstd]"
+        )
+    return zstandard
+
+
+class ParallelGzipWriter(io.BufferedIOBase):
+    """Write gzip data, compressing blocks in background threads
+
+    Like pigz and bgzip, each block is written as a separate gzip
+    member.  The concatenated members form a valid gzip file.  With
+    bgzf, blocks are written in the BGZF format used by bgzip, and the
+    file ends with an empty BGZF block.
+    """
+
+    def __init__(
+        self, f, threads=1, block_size=BUFFER_SIZE, compresslevel=6, bgzf=False
+    ):
+        self.f = f
+        self.bgzf = bgzf
+        self.block_size = min(block_size, BGZF_BLOCK_SIZE) if bgzf else block_size
+        self.compresslevel = compresslevel
+        self._block = bytearray()
+        # Compressing a block releases the GIL, so threads can
+        # compress blocks while the main thread continues to work.
+        self._executor = concurrent.futures.ThreadPoolExecutor(max(threads, 1))
+        self._pending = collections.deque()
+        self._max_pending = 2 * max(threads, 1)
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        if self.closed:
+            raise ValueError("write to closed file")
+        self._block += b
+        while len(self._block) >= self.block_size:
+            self._submit(self._block[: self.block_size])
+            del self._block[: self.block_size]
+        return len(b)
+
+    def _submit(self, data):
+        if self.bgzf:
+            future = self._executor.submit(
+                bgzf_compress, bytes(data), self.compresslevel
+            )
+        else:
+            future = self._executor.submit(
+                gzip.compress, bytes(data), self.compresslevel, mtime=0
+            )
+        self._pending.append(future)
+        while len(self._pending) > self._max_pending:
+            self.f.write(self._pending.popleft().result())
+
+    def flush(self):
+        super().flush()
+        if self._block:
+            self._submit(self._block)
+            self._block = bytearray()
+        while self._pending:
+            self.f.write(self._pending.popleft().result())
+        self.f.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            super().close()
+            if self.bgzf:
+                self.f.write(BGZF_EOF)
+        finally:
+            self._executor.shutdown()
+            self.f.close()
+
+
+def bgzf_compress(data, compresslevel=6):
+    """Compress data as one BGZF block
+
+    The data must be no longer than BGZF_BLOCK_SIZE, so that the
+    compressed block fits in 64 KiB.
+    """
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    block_size = BGZF_HEADER.size + len(deflated) + 8
+    # Gzip header with an extra field giving the size of the block
+    header = BGZF_HEADER.pack(
+        0x1F, 0x8B, 8, 4, 0, 0, 0xFF, 6, ord("B"), ord("C"), 2, block_size - 1
+    )
+    trailer = struct.pack("<II", zlib.crc32(data), len(data))
+    return header + deflated + trailer
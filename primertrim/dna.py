@@ -35,6 +35,15 @@ AMBIGUOUS_BASES_COMPLEMENT = {
 }
 
 
+# For each unambiguous base, the order in which mismatched bases are
+# ranked.  Follows the order of the ambiguous base codes for all
+# bases except the one given.
+MISMATCH_RANKS = {
+    base: {b: n for n, b in enumerate(AMBIGUOUS_BASES[code])}
+    for base, code in AMBIGUOUS_BASES_COMPLEMENT.items()
+}
+
+
 def deambiguate(seq):
     nt_choices = [AMBIGUOUS_BASES[x] for x in seq]
     return ["".join(c) for c in itertools.product(*nt_choices)]
@@ -45,6 +54,17 @@ COMPLEMENT_BASES = {
     "C": "G",
     "A": "T",
     "G": "C",
+    "R": "Y",
+    "Y": "R",
+    "M": "K",
+    "K": "M",
+    "S": "S",
+    "W": "W",
+    "H": "D",
+    "B": "V",
+    "V": "B",
+    "D": "H",
+    "N": "N",
 }
 
 
@@ -62,6 +82,16 @@ def partial_seqs_right(seq, min_length):
             yield seq[:-num_to_remove]
 
 
+def split_segments(seq, n):
+    """Split seq into n segments of nearly equal length
+
+    Yields the offset and sequence of each segment.
+    """
+    boundaries = [i * len(seq) // n for i in range(n + 1)]
+    for start_idx, end_idx in zip(boundaries, boundaries[1:]):
+        yield start_idx, seq[start_idx:end_idx]
+
+
 def replace_with_n(seq, idxs):
     chars = list(seq)
     for idx in idxs:
@@ -0,0 +1,248 @@
+import itertools
+
+import numpy as np
+
+from .matcher import CompleteMatcher
+
+# Bases are encoded as one byte each.  Any character other than A, C,
+# G, or T is encoded as N, which never matches a primer base.
+# Padding beyond the end of a read never matches either.
+BASE_CODES = np.full(256, 4, dtype=np.uint8)
+for code, base in enumerate("ACGT"):
+    BASE_CODES[ord(base)] = code
+N_CODE = 4
+PAD_CODE = 5
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+def encode_seq(seq):
+    codes = np.frombuffer(seq.encode("ascii", "replace"), dtype=np.uint8)
+    return BASE_CODES[codes]
+
+
+class EncodedReads:
+    """Batch of read sequences stored in one contiguous array of base codes
+
+    Read n occupies codes[offsets[n]:offsets[n + 1]].
+    """
+
+    def __init__(self, seqs):
+        seqs = list(seqs)
+        self.lengths = np.array([len(seq) for seq in seqs], dtype=np.int64)
+        self.offsets = np.zeros(len(seqs) + 1, dtype=np.int64)
+        np.cumsum(self.lengths, out=self.offsets[1:])
+        self.codes = encode_seq("".join(seqs))
+        self._mismatch_masks = None
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def windows(self, width, from_end=False):
+        """Array with the first (or last) width bases of each read
+
+        Reads shorter than the width are padded at the end (or start).
+        """
+        cols = np.arange(width)
+        if from_end:
+            idxs = (self.offsets[1:] - width)[:, np.newaxis] + cols
+            in_read = idxs >= self.offsets[:-1, np.newaxis]
+        else:
+            idxs = self.offsets[:-1, np.newaxis] + cols
+            in_read = idxs < self.offsets[1:, np.newaxis]
+        windows = np.full((len(self), width), PAD_CODE, dtype=np.uint8)
+        windows[in_read] = self.codes[idxs[in_read]]
+        return windows
+
+    def find_near_matches(self, query_codes, max_mismatch):
+        """Find placements of an encoded query with up to max_mismatch mismatches
+
+        Returns the read index, start position within the read, and
+        number of mismatches for every placement that lies entirely
+        within a read.
+        """
+        n_positions = len(self.codes) - len(query_codes) + 1
+        if (n_positions <= 0) or (max_mismatch < 0):
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+
+        if self._mismatch_masks is None:
+            self._mismatch_masks = [
+                (self.codes != code).view(np.uint8) for code in range(N_CODE)
+            ]
+        counts = np.zeros(n_positions, dtype=np.uint16)
+        for idx, code in enumerate(query_codes.tolist()):
+            if code < N_CODE:
+                mismatches = self._mismatch_masks[code][idx : idx + n_positions]
+            else:
+                mismatches = 1
+            np.add(counts, mismatches, out=counts)
+
+        positions = np.flatnonzero(counts <= max_mismatch)
+        read_idxs = np.searchsorted(self.offsets, positions, side="right") - 1
+        starts = positions - self.offsets[read_idxs]
+        fits = starts + len(query_codes) <= self.lengths[read_idxs]
+        return read_idxs[fits], starts[fits], counts[positions[fits]]
+
+
+def iter_batches(seqs, batch_size=DEFAULT_BATCH_SIZE):
+    seqs = iter(seqs)
+    while True:
+        batch = list(itertools.islice(seqs, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class VectorizedCompleteMatcher(CompleteMatcher):
+    """Complete matcher that compares each query to a batch of reads at once"""
+
+    def __init__(
+        self,
+        queryset,
+        max_mismatch,
+        match_reverse_complement=True,
+        discard_before=None,
+    ):
+        super().__init__(
+            queryset, max_mismatch, match_reverse_complement, discard_before
+        )
+        # Queries are encoded once, rather than for every batch
+        self.query_codes = [encode_seq(query) for query in self.queryset]
+
+    def find_in_seqs(self, seqs):
+        for batch in iter_batches(seqs):
+            seq_ids = [seq_id for seq_id, _ in batch]
+            batch_seqs = [seq for _, seq in batch]
+            yield from zip(seq_ids, self.find_in_batch(batch_seqs))
+
+    def find_in_batch(self, seqs):
+        if not self.query_codes:
+            return [None] * len(seqs)
+        reads = EncodedReads(seqs)
+        found = [
+            reads.find_near_matches(query_codes, self.max_mismatch)
+            for query_codes in self.query_codes
+        ]
+        read_idxs = np.concatenate([f[0] for f in found])
+        starts = np.concatenate([f[1] for f in found])
+        counts = np.concatenate([f[2] for f in found]).astype(np.int64)
+        query_idxs = np.repeat(np.arange(len(found)), [len(f[0]) for f in found])
+
+        # The rank of a candidate starts with the number of mismatches
+        # and the query index, which we already have.  Only candidates
+        # that are best on these are ranked on the original sequence.
+        # As in find_match, matches starting before discard_before
+        # take priority over all others.
+        keys = counts * len(self.queryset) + query_idxs
+        if self.discard_before is not None:
+            late = starts >= self.discard_before
+            keys += late * (self.max_mismatch + 1) * len(self.queryset)
+        min_keys = np.full(len(reads), np.iinfo(np.int64).max)
+        np.minimum.at(min_keys, read_idxs, keys)
+        is_best = keys == min_keys[read_idxs]
+
+        best_ranks = [None] * len(reads)
+        self._rank_candidates(
+            seqs, best_ranks, read_idxs[is_best], query_idxs[is_best], starts[is_best]
+        )
+        # The best candidates can be rejected for the bases observed
+        # at the mismatches.  If so, we rank the others for that read.
+        retry = np.array([rank is None for rank in best_ranks])[read_idxs]
+        retry &= ~is_best
+        if retry.any():
+            self._rank_candidates(
+                seqs, best_ranks, read_idxs[retry], query_idxs[retry], starts[retry]
+            )
+        if self.discard_before is not None:
+            best_ranks = [rank and rank[1:] for rank in best_ranks]
+        return [self._match_from_rank(seq, rank) for seq, rank in zip(seqs, best_ranks)]
+
+    def _rank_candidates(self, seqs, best_ranks, read_idxs, query_idxs, starts):
+        # The final ranking is done on the original sequence, so the
+        # result is the same as for find_match
+        candidates = zip(read_idxs.tolist(), query_idxs.tolist(), starts.tolist())
+        for read_idx, query_idx, start_idx in candidates:
+            rank = self._rank_candidate(seqs[read_idx], query_idx, start_idx)
+            if rank is None:
+                continue
+            if self.discard_before is not None:
+                rank = (start_idx >= self.discard_before,) + rank
+            best_rank = best_ranks[read_idx]
+            if (best_rank is None) or (rank < best_rank):
+                best_ranks[read_idx] = rank
+
+
+def mott_trim_lengths(quals, starts, lengths, threshold, width=16):
+    """Modified Mott trimming for many reads at once
+
+    Quality scores for all reads are given in one array of Phred
+    bytes.  The last bases of each read are laid out in rows, from the
+    3' end back, and the running sums are found for all rows at once.
+    Reads where the running sum does not go below zero within the
+    block are done again with a wider block.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    trimmed = lengths.copy()
+    remaining = np.flatnonzero(lengths > 0)
+    while len(remaining):
+        read_lengths = lengths[remaining]
+        block_width = min(width, read_lengths.max())
+        from_end = np.arange(1, block_width + 1)
+        in_read = from_end <= read_lengths[:, None]
+        positions = starts[remaining, None] + read_lengths[:, None] - from_end
+        scores = quals[np.where(in_read, positions, 0)].astype(np.int32)
+        sums = np.cumsum(np.where(in_read, threshold - scores, 0), axis=1)
+
+        # The search stops where the running sum goes below zero
+        negative = sums < 0
+        stopped = negative.any(axis=1)
+        stop_cols = np.where(stopped, negative.argmax(axis=1), block_width)
+        done = stopped | (read_lengths <= block_width)
+        valid = in_read & (np.arange(block_width) < stop_cols[:, None])
+        valid_sums = np.where(valid, sums, 0)
+        # The first maximum is the one nearest the 3' end
+        best_cols = valid_sums.argmax(axis=1)
+        best_sums = valid_sums[np.arange(len(remaining)), best_cols]
+        cut = done & (best_sums > 0)
+        trimmed[remaining[cut]] = read_lengths[cut] - best_cols[cut] - 1
+
+        remaining = remaining[~done]
+        width *= 4
+    return trimmed
+
+
+def window_trim_lengths(quals, starts, lengths, threshold, window):
+    """Sliding window trimming for many reads at once
+
+    Window sums are found for every position in the array of Phred
+    bytes in one step.  Each read is cut at the first low quality
+    window that lies entirely within the read.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    trimmed = lengths.copy()
+    cumulative = np.zeros(len(quals) + 1, dtype=np.int64)
+    np.cumsum(quals, dtype=np.int64, out=cumulative[1:])
+    window_sums = cumulative[window:] - cumulative[: len(cumulative) - window]
+    low_windows = np.flatnonzero(window_sums < threshold * window)
+    if len(low_windows) == 0:
+        return trimmed
+    next_low = np.searchsorted(low_windows, starts)
+    first_low = low_windows[np.minimum(next_low, len(low_windows) - 1)]
+    in_read = (next_low < len(low_windows)) & (first_low <= starts + lengths - window)
+    trimmed[in_read] = first_low[in_read] - starts[in_read]
+    return trimmed
+
+
+def trim_quality_batch(trimmer, qual_buffer, starts, lengths):
+    """Quality trim a batch of reads that lie next to each other in a buffer"""
+    offset = starts[0]
+    end = starts[-1] + lengths[-1]
+    quals = np.frombuffer(qual_buffer[offset:end].encode("ascii"), dtype=np.uint8)
+    if trimmer.method == "mott":
+        return mott_trim_lengths(quals, starts - offset, lengths, trimmer.threshold)
+    return window_trim_lengths(
+        quals, starts - offset, lengths, trimmer.threshold, trimmer.window
+    )
@@ -0,0 +1,56 @@
+from .bitparallel import BitParallelCompleteMatcher, BitParallelPartialMatcher
+from .dna import deambiguate
+from .matcher import AdaptiveCompleteMatcher, CompleteMatcher, PartialMatcher
+
+MATCHING_ENGINES = ["python", "numpy", "bitparallel", "adaptive"]
+
+
+def build_matchers(
+    primers,
+    mismatches,
+    min_partial,
+    match_reverse_complement,
+    engine="python",
+    discard_before=None,
+):
+    """Build the matchers for the complete and partial matching stages"""
+    if engine == "bitparallel":
+        # Degenerate primers are matched as they are
+        matchers = [
+            BitParallelCompleteMatcher(
+                primers, mismatches, match_reverse_complement, discard_before
+            ),
+            BitParallelPartialMatcher(primers, min_partial, match_reverse_complement),
+        ]
+        return matchers
+
+    queryset = deambiguate_primers(primers)
+
+    if engine == "numpy":
+        # The numpy engine requires NumPy, which is optional
+        from .encoded import VectorizedCompleteMatcher
+
+        complete_matcher_cls = VectorizedCompleteMatcher
+    elif engine == "adaptive":
+        complete_matcher_cls = AdaptiveCompleteMatcher
+    else:
+        complete_matcher_cls = CompleteMatcher
+
+    # Partial matches are found faster with the prefix trie than
+    # with vectorized comparisons, so the numpy engine uses it too.
+    matchers = [
+        complete_matcher_cls(
+            queryset, mismatches, match_reverse_complement, discard_before
+        ),
+        PartialMatcher(queryset, min_partial, match_reverse_complement),
+    ]
+    return matchers
+
+
+def deambiguate_primers(primers):
+    """Expand degenerate primers into every unambiguous sequence"""
+    queryset = []
+    for ambiguous_primer in primers:
+        for unambiguous_primer in deambiguate(ambiguous_primer):
+            queryset.append(unambiguous_primer)
+    return queryset
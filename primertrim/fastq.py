@@ -0,0 +1,111 @@
+import io
+import itertools
+import operator
+
+PARSE_BATCH_SIZE = 100
+WRITE_BATCH_SIZE = 10000
+
+
+class FastqFormatError(ValueError):
+    pass
+
+
+def parse_fastq(f, batch_size=PARSE_BATCH_SIZE):
+    """Parse a FASTQ file, yielding (desc, seq, qual) for each read
+
+    The file may be opened in text or binary mode.  Records are parsed
+    in batches, and each batch is checked for a description line
+    starting with "@", a separator line starting with "+", and a
+    quality string as long as the sequence.  Trailing whitespace is
+    removed from every line.
+    """
+    if isinstance(f, io.TextIOBase):
+        yield from _parse_lines(f, batch_size)
+        return
+    text_f = io.TextIOWrapper(f, encoding="utf-8")
+    try:
+        yield from _parse_lines(text_f, batch_size)
+    finally:
+        # Leave the binary file open for the caller
+        text_f.detach()
+
+
+def _parse_lines(f, batch_size):
+    record_num = 0
+    while True:
+        lines = list(itertools.islice(f, 4 * batch_size))
+        n_complete = len(lines) // 4 * 4
+        incomplete = lines[n_complete:]
+        del lines[n_complete:]
+        if lines:
+            descs = list(map(str.rstrip, lines[0::4]))
+            seqs = list(map(str.rstrip, lines[1::4]))
+            plus_lines = lines[2::4]
+            quals = list(map(str.rstrip, lines[3::4]))
+            _check_records(record_num, descs, seqs, plus_lines, quals)
+            record_num += len(descs)
+            yield from zip(map(operator.itemgetter(slice(1, None)), descs), seqs, quals)
+        # Ignore blank lines at the end of the file
+        incomplete = [line for line in incomplete if line.strip()]
+        if incomplete:
+            raise FastqFormatError(
+                "Incomplete FASTQ record at end of file: {}".format(
+                    incomplete[-1].rstrip()[:50]
+                )
+            )
+        if n_complete < 4 * batch_size:
+            return
+
+
+def _check_records(record_num, descs, seqs, plus_lines, quals):
+    # Each check runs over the whole block at once.  If a check fails,
+    # we go back to find the first bad record.
+    if not all(map(str.startswith, descs, itertools.repeat("@"))):
+        bad_idx = next(i for i, desc in enumerate(descs) if not desc.startswith("@"))
+        _raise_record_error(
+            record_num + bad_idx, descs[bad_idx], "description does not start with @"
+        )
+    if not all(map(str.startswith, plus_lines, itertools.repeat("+"))):
+        bad_idx = next(
+            i for i, line in enumerate(plus_lines) if not line.startswith("+")
+        )
+        _raise_record_error(
+            record_num + bad_idx, descs[bad_idx], "missing + separator line"
+        )
+    if list(map(len, seqs)) != list(map(len, quals)):
+        bad_idx = next(
+            i for i, (seq, qual) in enumerate(zip(seqs, quals)) if len(seq) != len(qual)
+        )
+        _raise_record_error(
+            record_num + bad_idx,
+            descs[bad_idx],
+            "sequence and quality have different lengths",
+        )
+
+
+def _raise_record_error(record_idx, desc, message):
+    raise FastqFormatError(
+        "Malformed FASTQ record {0} ({1}): {2}".format(
+            record_idx + 1, desc[:50], message
+        )
+    )
+
+
+def write_fastq(f, reads, batch_size=WRITE_BATCH_SIZE):
+    """Write (desc, seq, qual) tuples to a text file in FASTQ format
+
+    Reads are written in batches, joining all the lines of a batch in
+    one step.  Returns the number of reads written.
+    """
+    reads = iter(reads)
+    num_reads = 0
+    while True:
+        batch = list(itertools.islice(reads, batch_size))
+        if not batch:
+            return num_reads
+        num_reads += len(batch)
+        descs, seqs, quals = zip(*batch)
+        records = zip(descs, seqs, itertools.repeat("+"), quals)
+        f.write("@")
+        f.write("\n@".join(map("\n".join, records)))
+        f.write("\n")
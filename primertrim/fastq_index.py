@@ -0,0 +1,210 @@
+import argparse
+import itertools
+import json
+import os
+
+from .compression import open_input
+from .fastq import parse_fastq
+
+DEFAULT_INDEX_INTERVAL = 1000
+INDEX_EXTENSION = ".fqi"
+SKIP_BLOCK_SIZE = 1024 * 1024
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(
+        description=(
+            "Index the records in FASTQ files, so that ptrim can start "
+            "at any record without reading the file from the beginning. "
+            "The index is written next to each FASTQ file, with the "
+            "extension {}".format(INDEX_EXTENSION)
+        )
+    )
+    p.add_argument("fastq", nargs="+", help="FASTQ file to index")
+    p.add_argument(
+        "--interval",
+        type=int,
+        default=DEFAULT_INDEX_INTERVAL,
+        help="Number of records between indexed positions (default: %(default)s)",
+    )
+    args = p.parse_args(argv)
+    if args.interval < 1:
+        p.error("--interval must be positive")
+
+    for fp in args.fastq:
+        with open_input(fp) as f:
+            index = FastqIndex.build(f, args.interval)
+        index.file_size = os.path.getsize(fp)
+        with open(index_path(fp), "w") as f:
+            index.write(f)
+
+
+def index_path(fastq_fp):
+    return fastq_fp + INDEX_EXTENSION
+
+
+class FastqIndex:
+    """Positions of records in a FASTQ file
+
+    The position of every nth record is stored, counting bytes in the
+    decompressed file.  The size of the file on disk is kept to check
+    that the index is up to date.
+    """
+
+    def __init__(self, num_records, interval, offsets, file_size=None):
+        self.num_records = num_records
+        self.interval = interval
+        self.offsets = offsets
+        self.file_size = file_size
+
+    @classmethod
+    def build(cls, f, interval=DEFAULT_INDEX_INTERVAL):
+        """Index a FASTQ file opened in binary mode"""
+        offsets = []
+        num_lines = 0
+        # Blank lines at the end of the file are not counted
+        num_record_lines = 0
+        offset = 0
+        for line in f:
+            if num_lines % (4 * interval) == 0:
+                offsets.append(offset)
+            num_lines += 1
+            offset += len(line)
+            if line.strip():
+                num_record_lines = num_lines
+        num_records = num_record_lines // 4
+        # Drop positions past the last record
+        del offsets[(num_records + interval - 1) // interval :]
+        return cls(num_records, interval, offsets)
+
+    @classmethod
+    def load(cls, f):
+        vals = json.load(f)
+        return cls(
+            vals["num_records"], vals["interval"], vals["offsets"], vals["file_size"]
+        )
+
+    def write(self, f):
+        vals = {
+            "num_records": self.num_records,
+            "interval": self.interval,
+            "file_size": self.file_size,
+            "offsets": self.offsets,
+        }
+        json.dump(vals, f)
+        f.write("\n")
+
+    def seek_record(self, record_idx):
+        """Find the nearest indexed record at or before the given record
+
+        Returns the indexed record and its position in the file.
+        """
+        offset_idx = min(record_idx // self.interval, len(self.offsets) - 1)
+        if offset_idx < 0:
+            return 0, 0
+        return offset_idx * self.interval, self.offsets[offset_idx]
+
+
+def load_index(fastq_fp):
+    """Load the index for a FASTQ file, if one has been built
+
+    Returns None if there is no index.  Raises an error if the FASTQ
+    file has changed since the index was built.
+    """
+    if fastq_fp is None:
+        return None
+    fp = index_path(fastq_fp)
+    if not os.path.exists(fp):
+        return None
+    with open(fp) as f:
+        index = FastqIndex.load(f)
+    if index.file_size != os.path.getsize(fastq_fp):
+        raise ValueError(
+            "FASTQ index is out of date, re-run ptrim-index: {}".format(fp)
+        )
+    return index
+
+
+def count_records(fastq_fp):
+    """Number of records in a FASTQ file, from the index if available"""
+    index = load_index(fastq_fp)
+    if index is None:
+        with open_input(fastq_fp) as f:
+            index = FastqIndex.build(f)
+    return index.num_records
+
+
+def parse_fastq_range(f, start=0, stop=None, index=None):
+    """Parse records from start up to, but not including, stop
+
+    The file must be opened in binary mode.  If an index is given, we
+    skip directly to the nearest indexed record before the start.
+    Otherwise, the records before the start are read and discarded.
+    """
+    if (index is not None) and (start > 0):
+        indexed_record, offset = index.seek_record(start)
+        skip_bytes(f, offset)
+        start -= indexed_record
+        if stop is not None:
+            stop -= indexed_record
+    return itertools.islice(parse_fastq(f), start, stop)
+
+
+def skip_bytes(f, num_bytes):
+    """Move forward in a file that may not support seeking"""
+    if f.seekable():
+        f.seek(num_bytes, os.SEEK_CUR)
+        return
+    while num_bytes > 0:
+        block = f.read(min(num_bytes, SKIP_BLOCK_SIZE))
+        if not block:
+            return
+        num_bytes -= len(block)
+
+
+def parse_record_range(text):
+    """Parse a range of records like "1001-2000", counting from 1
+
+    Either end may be left out.  Returns the start and stop as Python
+    indices, with a stop of None for the end of the file.
+    """
+    first, sep, last = text.partition("-")
+    if not sep:
+        raise argparse.ArgumentTypeError(
+            "Record range must be given as FIRST-LAST: {}".format(text)
+        )
+    try:
+        start = int(first) - 1 if first else 0
+        stop = int(last) if last else None
+    except ValueError:
+        raise argparse.ArgumentTypeError("Invalid record range: {}".format(text))
+    if (start < 0) or ((stop is not None) and (stop <= start)):
+        raise argparse.ArgumentTypeError("Invalid record range: {}".format(text))
+    return start, stop
+
+
+def parse_shard(text):
+    """Parse a shard like "3/8", counting from 1
+
+    Returns the shard number and the number of shards.
+    """
+    shard, sep, num_shards = text.partition("/")
+    try:
+        shard = int(shard)
+        num_shards = int(num_shards)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Shard must be given as K/N: {}".format(text))
+    if not (1 <= shard <= num_shards):
+        raise argparse.ArgumentTypeError("Invalid shard: {}".format(text))
+    return shard, num_shards
+
+
+def shard_range(shard, num_shards, num_records):
+    """Start and stop of the records in one shard of a file
+
+    Shards are contiguous, so the output files for shards 1 to N can
+    be concatenated in order.
+    """
+    start = num_records * (shard - 1) // num_shards
+    stop = num_records * shard // num_shards
+    return start, stop
@@ -0,0 +1,170 @@
+import collections
+import io
+import json
+import os
+
+from .compression import open_output
+from .trimmable_reads import TrimmableReads
+
+LOG_FORMATS = ["tsv", "parquet"]
+
+LOG_FORMAT_EXTENSIONS = {
+    ".parquet": "parquet",
+}
+
+
+def log_format_from_filename(fp):
+    _, ext = os.path.splitext(fp)
+    return LOG_FORMAT_EXTENSIONS.get(ext.lower(), "tsv")
+
+
+def open_log_writer(fp, log_format=None, append=False):
+    """Open a log file for writing
+
+    If the format is not given, it is determined from the file
+    extension.  Tab-separated logs are compressed if the filename ends
+    in .gz or .zst, and can be appended to.  Returns None if no
+    filepath is given.
+    """
+    if not fp:
+        return None
+    if log_format is None:
+        log_format = log_format_from_filename(fp)
+    if log_format == "tsv":
+        return TsvLogWriter(fp, append)
+    if append:
+        raise ValueError("Cannot append to a {} log file".format(log_format))
+    if log_format == "parquet":
+        return ParquetLogWriter(fp)
+    raise ValueError("Unknown log format: {}".format(log_format))
+
+
+def write_log(f, loginfo, colnames=None):
+    if colnames:
+        f.write("\t".join(colnames))
+        f.write("\n")
+    for vals in loginfo:
+        f.write("\t".join(str(v) if v is not None else "" for v in vals))
+        f.write("\n")
+
+
+class TsvLogWriter:
+    def __init__(self, fp, append=False):
+        self.f = io.TextIOWrapper(open_output(fp, append=append), encoding="utf-8")
+        if not append:
+            write_log(self.f, [], TrimmableReads.loginfo_colnames)
+
+    def write(self, loginfo):
+        write_log(self.f, loginfo)
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetLogWriter:
+    """Write the log as a Parquet file, one row group per batch of reads
+
+    The match type and observed primer columns are dictionary encoded,
+    and the numeric columns are stored as integers.
+    """
+
+    def __init__(self, fp):
+        pa, pq = _import_pyarrow()
+        self.pa = pa
+        self.schema = pa.schema(
+            [
+                ("read_id", pa.string()),
+                ("match_type", pa.dictionary(pa.int8(), pa.string())),
+                ("trimmed_length", pa.int32()),
+                ("mismatches", pa.int16()),
+                ("observed_primer", pa.dictionary(pa.int32(), pa.string())),
+            ]
+        )
+        self.writer = pq.ParquetWriter(fp, self.schema, compression="zstd")
+
+    def write(self, loginfo):
+        cols = list(zip(*loginfo))
+        if not cols:
+            return
+        arrays = [
+            (
+                self.pa.array(vals, type=field.type.value_type).dictionary_encode()
+                if self.pa.types.is_dictionary(field.type)
+                else self.pa.array(vals, type=field.type)
+            )
+            for vals, field in zip(cols, self.schema)
+        ]
+        table = self.pa.Table.from_arrays(arrays, schema=self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(
+            "The pyarrow package is required for Parquet log files. "
+            "Install it with: pip install primertrim[parquet]"
+        )
+    return pyarrow, pyarrow.parquet
+
+
+class LogSummary:
+    """Summary of the log for one sample
+
+    Counts the reads for each match type, the number of mismatches in
+    matched primers, and each primer sequence observed.
+    """
+
+    def __init__(self):
+        self.num_reads = 0
+        self.match_counts = collections.Counter()
+        self.mismatch_counts = collections.Counter()
+        self.primer_counts = collections.Counter()
+
+    @classmethod
+    def from_dict(cls, vals):
+        summary = cls()
+        summary.num_reads = vals["reads"]
+        summary.match_counts.update(vals["match_counts"])
+        summary.mismatch_counts.update(
+            {int(k): v for k, v in vals["mismatch_counts"].items()}
+        )
+        summary.primer_counts.update(vals["primer_counts"])
+        return summary
+
+    def update(self, loginfo):
+        collections.deque(self.update_iter(loginfo), maxlen=0)
+
+    def update_iter(self, loginfo):
+        """Update the summary while passing the log entries along"""
+        for vals in loginfo:
+            _, match_type, _, mismatches, observed_primer = vals
+            self.num_reads += 1
+            self.match_counts[match_type] += 1
+            if mismatches is not None:
+                self.mismatch_counts[mismatches] += 1
+            if observed_primer is not None:
+                self.primer_counts[observed_primer] += 1
+            yield vals
+
+    def to_dict(self):
+        return {
+            "reads": self.num_reads,
+            "match_counts": dict(self.match_counts.most_common()),
+            "mismatch_counts": {
+                str(k): v for k, v in sorted(self.mismatch_counts.items())
+            },
+            "primer_counts": dict(self.primer_counts.most_common()),
+        }
+
+    def write(self, f):
+        json.dump(self.to_dict(), f, indent=2)
+        f.write("\n")
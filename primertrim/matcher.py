@@ -1,15 +1,15 @@
 import abc
 import collections
-import itertools
 import os.path
+import tempfile
 
+from .automaton import AhoCorasick, PrefixTrie
 from .dna import (
-    AMBIGUOUS_BASES_COMPLEMENT,
-    deambiguate,
+    MISMATCH_RANKS,
     reverse_complement,
-    replace_with_n,
     partial_seqs_left,
     partial_seqs_right,
+    split_segments,
 )
 from .align import VsearchAligner
 
@@ -19,6 +19,8 @@ PrimerMatch = collections.namedtuple(
 
 
 class Matcher(abc.ABC):
+    stage = "matcher"
+
     def __init__(self, queryset, match_reverse_complement=True):
         queryset = list(queryset)  # We iterate through the queryset twice
         self.queryset = queryset.copy()
@@ -38,59 +40,205 @@ class Matcher(abc.ABC):
 
 
 class CompleteMatcher(Matcher):
-    def __init__(self, queryset, max_mismatch, match_reverse_complement=True):
+    stage = "complete"
+
+    def __init__(
+        self,
+        queryset,
+        max_mismatch,
+        match_reverse_complement=True,
+        discard_before=None,
+    ):
         super().__init__(queryset, match_reverse_complement)
         self.max_mismatch = max_mismatch
+        # A match starting before this position trims the read so
+        # much that it will be discarded.  If one is found, we don't
+        # look for a better match in the rest of the read.
+        self.discard_before = discard_before
+        self.max_query_len = max((len(q) for q in self.queryset), default=0)
 
-        # To look for near matches in the reference sequence, we
-        # generate the set of qeury sequences with 0, 1, or 2 errors
-        # and look for these in the reference.  This is our
-        # "mismatched queryset."
-        possible_mismatches = range(max_mismatch + 1)
-        self.mismatched_queryset = [
-            self._mismatched_queries(n) for n in possible_mismatches
-        ]
-
-    def _mismatched_queries(self, n_mismatch):
-        # The generator is provides a sequence for one-time use, but
-        # we need to go through it multiple times.  This function
-        # wraps the generator to provide a list.
-        return list(self._iter_mismatched_queries(n_mismatch))
-
-    def _iter_mismatched_queries(self, n_mismatch):
-        if n_mismatch not in [0, 1, 2, 3]:
-            raise TooManyMismatchesException(
-                "This algorithm is terrible unless the number of mismatches is very small (0, 1, 2, or 3)"
-            )
-        for query in self.queryset:
-            idx_sets = itertools.combinations(range(len(query)), n_mismatch)
-            for idx_set in idx_sets:
-                # Replace base at each position with a literal "N", to match
-                # ambiguous bases in other sequences
-                yield replace_with_n(query, idx_set)
-                # Change to list because strings are immutable
-                qchars = list(query)
-                # Replace the base at each mismatch position with an
-                # ambiguous base specifying all possibilities BUT the one
-                # we see.
-                for idx in idx_set:
-                    qchars[idx] = AMBIGUOUS_BASES_COMPLEMENT[qchars[idx]]
-                # Expand to all possibilities for mismatching at this
-                # particular set of positions
-                for query_with_mismatches in deambiguate(qchars):
-                    yield query_with_mismatches
+        # If a query matches the read with n mismatches or fewer, at
+        # least one of n + 1 non-overlapping segments of the query
+        # must match the read exactly.  We find these segments, or
+        # "seeds", in one pass over the read, and check the rest of
+        # the query at each position where a seed is found.
+        self.seeds = collections.defaultdict(list)
+        self.unseeded_queries = []
+        n_segments = max_mismatch + 1
+        for query_idx, query in enumerate(self.queryset):
+            if n_segments < 1:
+                break
+            if len(query) < n_segments:
+                self.unseeded_queries.append(query_idx)
+                continue
+            for offset, segment in split_segments(query, n_segments):
+                self.seeds[segment].append((query_idx, offset))
+        self.automaton = AhoCorasick(self.seeds)
+
+    def _iter_candidates(self, seq):
+        for end_idx, seed in self.automaton.iter_matches(seq):
+            for query_idx, offset in self.seeds[seed]:
+                start_idx = end_idx + 1 - len(seed) - offset
+                query_len = len(self.queryset[query_idx])
+                if (start_idx >= 0) and (start_idx + query_len <= len(seq)):
+                    yield query_idx, start_idx
+        for query_idx in self.unseeded_queries:
+            query_len = len(self.queryset[query_idx])
+            for start_idx in range(len(seq) - query_len + 1):
+                yield query_idx, start_idx
+
+    def _rank_candidate(self, seq, query_idx, start_idx):
+        # Rank candidate matches in the order that they would be found
+        # by searching for each query with 0, 1, 2, ... mismatches.
+        # At each number of mismatches, queries are tried in order,
+        # then positions of the mismatches in the query, then the
+        # bases observed at those positions.  Observed bases at the
+        # mismatch positions must be all "N" or all unambiguous.
+        query = self.queryset[query_idx]
+        mismatch_idxs = []
+        for idx, query_base in enumerate(query):
+            if seq[start_idx + idx] != query_base:
+                mismatch_idxs.append(idx)
+                if len(mismatch_idxs) > self.max_mismatch:
+                    return None
+        observed_bases = [seq[start_idx + idx] for idx in mismatch_idxs]
+        if all(b == "N" for b in observed_bases):
+            variant_rank = 0
+        else:
+            variant_rank = 1
+            for idx, observed_base in zip(mismatch_idxs, observed_bases):
+                mismatch_ranks = MISMATCH_RANKS[query[idx]]
+                if observed_base not in mismatch_ranks:
+                    return None
+                variant_rank = (
+                    (variant_rank - 1) * 3 + mismatch_ranks[observed_base] + 1
+                )
+        return (
+            len(mismatch_idxs),
+            query_idx,
+            tuple(mismatch_idxs),
+            variant_rank,
+            start_idx,
+        )
+
+    def find_match(self, seq):
+        return self._match_from_rank(seq, self._find_rank(seq))
+
+    def _find_rank(self, seq):
+        if self.discard_before is None:
+            return self._find_best_rank(seq)
+
+        # Matches starting before the split lie entirely within the
+        # prefix, and the rest start in the suffix, so we look at
+        # each part of the read once.
+        split_idx = min(self.discard_before, len(seq))
+        prefix = seq[: split_idx + self.max_query_len - 1]
+        best = self._find_best_rank(prefix, split_idx)
+        if best is None:
+            best = self._find_best_rank(seq[split_idx:])
+            if best is not None:
+                best = best[:-1] + (best[-1] + split_idx,)
+        return best
+
+    def _find_best_rank(self, seq, max_start=None):
+        best = None
+        for query_idx, start_idx in set(self._iter_candidates(seq)):
+            if (max_start is not None) and (start_idx >= max_start):
+                continue
+            rank = self._rank_candidate(seq, query_idx, start_idx)
+            if (rank is not None) and ((best is None) or (rank < best)):
+                best = rank
+        return best
+
+    def _match_from_rank(self, seq, rank):
+        if rank is not None:
+            n_mismatches, query_idx, _, _, start_idx = rank
+            end_idx = start_idx + len(self.queryset[query_idx])
+            primerseq = seq[start_idx:end_idx]
+            return PrimerMatch("Complete", start_idx, n_mismatches, primerseq)
+
+
+class AdaptiveCompleteMatcher(CompleteMatcher):
+    """Check the queries that match most often first
+
+    The number of exact matches to each query is counted as reads are
+    searched.  Queries that have matched before are tried in order of
+    their counts with a fast exact search.  The first one found is the
+    best match if no query earlier in the queryset matches exactly, so
+    the results are the same as for CompleteMatcher.  If not, or if no
+    frequent query is found, we search the read as usual.
+    """
+
+    def __init__(
+        self,
+        queryset,
+        max_mismatch,
+        match_reverse_complement=True,
+        discard_before=None,
+        update_interval=1000,
+        max_frequent_queries=8,
+    ):
+        super().__init__(
+            queryset, max_mismatch, match_reverse_complement, discard_before
+        )
+        self.update_interval = update_interval
+        self.max_frequent_queries = max_frequent_queries
+        self.query_counts = collections.Counter()
+        self.frequent_queries = []
+        self.reads_until_update = update_interval
 
     def find_match(self, seq):
-        for n_mismatches, queryset in enumerate(self.mismatched_queryset):
-            for query in queryset:
-                start_idx = seq.find(query)
-                if start_idx > -1:
-                    end_idx = start_idx + len(query)
-                    primerseq = seq[start_idx:end_idx]
-                    return PrimerMatch("Complete", start_idx, n_mismatches, primerseq)
+        rank = self._find_frequent_rank(seq)
+        if rank is None:
+            rank = self._find_rank(seq)
+        if (rank is not None) and (rank[0] == 0):
+            self.query_counts[rank[1]] += 1
+        self.reads_until_update -= 1
+        if self.reads_until_update <= 0:
+            self.frequent_queries = [
+                query_idx
+                for query_idx, _ in self.query_counts.most_common(
+                    self.max_frequent_queries
+                )
+            ]
+            self.reads_until_update = self.update_interval
+        return self._match_from_rank(seq, rank)
+
+    def _find_frequent_rank(self, seq):
+        # Matches starting after discard_before are ranked below any
+        # match starting before, so we only look before it.
+        max_start = len(seq)
+        if self.discard_before is not None:
+            max_start = min(self.discard_before, len(seq))
+        for query_idx in self.frequent_queries:
+            query = self.queryset[query_idx]
+            start_idx = seq.find(query, 0, max_start + len(query) - 1)
+            if start_idx >= 0:
+                break
+        else:
+            return None
+        for other_query in self.queryset[:query_idx]:
+            if seq.find(other_query, 0, max_start + len(other_query) - 1) >= 0:
+                return None
+        return (0, query_idx, (), 0, start_idx)
+
+
+class ShortReadMatcher(Matcher):
+    """Flag reads that are already too short to be written"""
+
+    stage = "length"
+
+    def __init__(self, min_length):
+        self.min_length = min_length
+
+    def find_match(self, seq):
+        if len(seq) < self.min_length:
+            return PrimerMatch("Too short", len(seq), None, None)
 
 
 class PartialMatcher(Matcher):
+    stage = "partial"
+
     def __init__(self, queryset, min_length, match_reverse_complement=True):
         super().__init__(queryset, match_reverse_complement)
         self.min_length = min_length
@@ -103,49 +251,191 @@ class PartialMatcher(Matcher):
             for s in partial_seqs_right(query, self.min_length):
                 self.partial_queries_right.append(s)
 
+        # The right partial queries are matched from the end of the
+        # read, so they go into the trie reversed.
+        self.left_trie = PrefixTrie(self.partial_queries_left)
+        self.right_trie = PrefixTrie(q[::-1] for q in self.partial_queries_right)
+
     def find_match(self, seq):
-        for left_partial_query in self.partial_queries_left:
-            if seq.startswith(left_partial_query):
-                return PrimerMatch("Partial", 0, 0, left_partial_query)
-        for right_partial_query in self.partial_queries_right:
-            if seq.endswith(right_partial_query):
-                start_idx = len(seq) - len(right_partial_query)
-                return PrimerMatch("Partial", start_idx, 0, right_partial_query)
+        query_idx = self.left_trie.find_prefix(seq)
+        if query_idx is not None:
+            left_partial_query = self.partial_queries_left[query_idx]
+            return PrimerMatch("Partial", 0, 0, left_partial_query)
+        query_idx = self.right_trie.find_prefix(reversed(seq))
+        if query_idx is not None:
+            right_partial_query = self.partial_queries_right[query_idx]
+            start_idx = len(seq) - len(right_partial_query)
+            return PrimerMatch("Partial", start_idx, 0, right_partial_query)
+
+
+class MemoizedMatcher:
+    """Match each distinct sequence once, re-using results for duplicates
+
+    Results are kept for the max_size most recently seen sequences, so
+    that memory use stays bounded.
+    """
+
+    def __init__(self, matcher, max_size):
+        self.matcher = matcher
+        self.stage = matcher.stage
+        self.max_size = max_size
+        self.memo = collections.OrderedDict()
+
+    def find_in_seqs(self, seqs):
+        seqs = list(seqs)
+        results = {}
+        new_seqs = {}
+        for seq_id, seq in seqs:
+            if seq in results:
+                continue
+            if seq in self.memo:
+                self.memo.move_to_end(seq)
+                results[seq] = self.memo[seq]
+            elif seq not in new_seqs:
+                new_seqs[seq] = seq_id
+
+        # The first read with each new sequence stands in for all the
+        # reads with that sequence.
+        new_seq_ids = {seq_id: seq for seq, seq_id in new_seqs.items()}
+        new_results = self.matcher.find_in_seqs(
+            (seq_id, seq) for seq, seq_id in new_seqs.items()
+        )
+        for seq_id, matchobj in new_results:
+            seq = new_seq_ids[seq_id]
+            results[seq] = matchobj
+            self.memo[seq] = matchobj
+        for seq in new_seqs:
+            # Matchers may leave out reads without a match
+            results.setdefault(seq, None)
+            self.memo.setdefault(seq, None)
+        while len(self.memo) > self.max_size:
+            self.memo.popitem(last=False)
+
+        for seq_id, seq in seqs:
+            yield seq_id, results[seq]
+
+
+class WindowedMatcher:
+    """Search for primers only within a window of each read
+
+    The window runs from start to end (or the end of the read), and is
+    limited to the last bases of the read if last is given.  Match
+    positions are reported relative to the full read.
+    """
+
+    def __init__(self, matcher, start=0, end=None, last=None):
+        self.matcher = matcher
+        self.stage = matcher.stage
+        self.start = start
+        self.end = end
+        self.last = last
+
+    def get_window(self, seq_len):
+        start_idx = self.start
+        if self.last is not None:
+            start_idx = max(start_idx, seq_len - self.last)
+        end_idx = seq_len if self.end is None else min(self.end, seq_len)
+        return min(start_idx, end_idx), end_idx
+
+    def find_in_seqs(self, seqs):
+        seqs = list(seqs)
+        offsets = {}
+        windows = []
+        for seq_id, seq in seqs:
+            start_idx, end_idx = self.get_window(len(seq))
+            if start_idx < end_idx:
+                offsets[seq_id] = start_idx
+                windows.append((seq_id, seq[start_idx:end_idx]))
+
+        results = {}
+        for seq_id, matchobj in self.matcher.find_in_seqs(windows):
+            if matchobj is not None:
+                start_idx = matchobj.start + offsets[seq_id]
+                results[seq_id] = matchobj._replace(start=start_idx)
+        for seq_id, _ in seqs:
+            yield seq_id, results.get(seq_id)
+
+
+ALIGNMENT_BACKENDS = ["vsearch", "builtin"]
 
 
 class AlignmentMatcher(Matcher):
-    def __init__(self, queryset, alignment_dir, align_id, cores=1):
+    stage = "alignment"
+
+    def __init__(self, queryset, alignment_dir, align_id, cores=1, backend="vsearch"):
         self.queryset = queryset
+        self.align_id = align_id
+        self.cores = cores
+        self.backend = backend
+        if backend == "vsearch":
+            self._init_vsearch(alignment_dir)
+        elif backend == "builtin":
+            # The built-in aligner requires NumPy, which is optional
+            from .semiglobal import SemiglobalAligner
+
+            self.aligner = SemiglobalAligner(self.queryset, self.align_id)
+        else:
+            raise ValueError("Unknown alignment backend: {}".format(backend))
+
+    def _init_vsearch(self, alignment_dir):
+        if alignment_dir is None:
+            # Without an alignment directory, only the primer database
+            # is written to disk.  Reads are sent to vsearch through a
+            # pipe.
+            self._temp_dir = tempfile.TemporaryDirectory()
+            self.keep_files = False
+            alignment_dir = self._temp_dir.name
+        else:
+            self.keep_files = True
         if not os.path.exists(alignment_dir):
             raise FileNotFoundError("Alignment directory does not exist")
         if not os.path.isdir(alignment_dir):
             raise NotADirectoryError("Alignment directory is not a directory")
         self.alignment_dir = alignment_dir
-        self.align_id = align_id
-        self.cores = cores
+
+        # The database contains the primer sequences.  It's written
+        # once and re-used for every batch of reads.
+        self.subject_fp = self._make_fp("subject.fa")
+        with open(self.subject_fp, "w") as f:
+            for n, seq in enumerate(self.queryset):
+                f.write(">seq{}\n{}\n".format(n, seq))
+        self.aligner = VsearchAligner(self.subject_fp)
 
     def _make_fp(self, filename):
         return os.path.join(self.alignment_dir, filename)
 
     def find_in_seqs(self, seqs):
         seqs = dict(seqs)
-        # Create the file paths
-        subject_fp = self._make_fp("subject.fa")
-        query_fp = self._make_fp("query.fa")
-        result_fp = self._make_fp("vsearch_hits.txt")
+        if not seqs:
+            return
 
-        # The database contains the primer sequences
-        with open(subject_fp, "w") as f:
-            for n, seq in enumerate(self.queryset):
-                f.write(">seq{}\n{}\n".format(n, seq))
+        if self.backend == "vsearch":
+            hits = self._search_vsearch(seqs)
+        else:
+            hits = self.aligner.search(seqs.items())
 
-        a = VsearchAligner(subject_fp)
-        hits = a.search(
+        for seq_id, start_idx, end_idx, mismatches in hits:
+            seq = seqs[seq_id]
+            primerseq = seq[start_idx:end_idx]
+            matchobj = PrimerMatch("Alignment", start_idx, mismatches, primerseq)
+            yield seq_id, matchobj
+
+    def _search_vsearch(self, seqs):
+        if self.keep_files:
+            query_fp = self._make_fp("query.fa")
+            result_fp = self._make_fp("vsearch_hits.txt")
+        else:
+            query_fp = None
+            result_fp = None
+
+        hits = self.aligner.search(
             seqs.items(), query_fp, result_fp, min_id=self.align_id, threads=self.cores
         )
 
+        # Vsearch reports the IDs as strings
+        seq_ids = {str(seq_id): seq_id for seq_id in seqs}
         for hit in hits:
-            seq_id = hit["qseqid"]
+            seq_id = seq_ids[hit["qseqid"]]
             mismatches = hit["mismatch"] + hit["gapopen"]
             # Vsearch indexes positions starting with 1
             start_idx = hit["qstart"] - 1
@@ -159,11 +449,4 @@ class AlignmentMatcher(Matcher):
                         start_idx, end_idx
                     )
                 )
-            seq = seqs[seq_id]
-            primerseq = seq[start_idx:end_idx]
-            matchobj = PrimerMatch("Alignment", start_idx, mismatches, primerseq)
-            yield seq_id, matchobj
-
-
-class TooManyMismatchesException(Exception):
-    pass
+            yield seq_id, start_idx, end_idx, mismatches
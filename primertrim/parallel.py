@@ -0,0 +1,69 @@
+import collections
+import concurrent.futures
+
+from .trimmable_reads import TrimmableReads
+
+# Number of reads in each chunk, unless the chunk size is given
+DEFAULT_PARALLEL_CHUNK_SIZE = 10000
+
+# Matchers for the current worker process, set once when the worker
+# starts so they are not sent along with every chunk of reads.
+_worker_matcher_sets = None
+
+
+def _init_worker(matcher_sets):
+    global _worker_matcher_sets
+    _worker_matcher_sets = matcher_sets
+
+
+def _match_reads(reads, matchers):
+    trimmable_reads = TrimmableReads(reads)
+    trimmable_reads.apply_matchers(matchers)
+    return trimmable_reads
+
+
+def _match_chunk(read_sets):
+    return [
+        _match_reads(reads, matchers)
+        for reads, matchers in zip(read_sets, _worker_matcher_sets)
+    ]
+
+
+def match_chunks(chunks, matchers, jobs=1):
+    """Apply matchers to each chunk of reads
+
+    Yields a TrimmableReads object for each chunk, in the order the
+    chunks were provided.  If more than one job is requested, chunks
+    are matched in a pool of worker processes.
+    """
+    chunk_sets = ([reads] for reads in chunks)
+    for (trimmable_reads,) in match_chunk_sets(chunk_sets, [matchers], jobs):
+        yield trimmable_reads
+
+
+def match_chunk_sets(chunk_sets, matcher_sets, jobs=1):
+    """Apply a different set of matchers to each part of a chunk
+
+    Each chunk contains a list of reads for each set of matchers.
+    Yields a list of TrimmableReads objects for each chunk.
+    """
+    if jobs <= 1:
+        for read_sets in chunk_sets:
+            yield [
+                _match_reads(reads, matchers)
+                for reads, matchers in zip(read_sets, matcher_sets)
+            ]
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+        jobs, initializer=_init_worker, initargs=(matcher_sets,)
+    ) as executor:
+        # Keep a limited number of chunks in flight, so that we don't
+        # read the whole input file into memory ahead of the workers.
+        pending = collections.deque()
+        for read_sets in chunk_sets:
+            pending.append(executor.submit(_match_chunk, read_sets))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,91 @@
+import queue
+import threading
+
+DEFAULT_QUEUE_SIZE = 2
+
+# Marks the end of the items in a queue
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def run_stages(items, stages, threaded=False, queue_size=DEFAULT_QUEUE_SIZE):
+    """Pass items through a series of stages
+
+    Each stage is a function that takes an iterator and returns an
+    iterator.  If threaded, each stage runs in its own thread, with a
+    bounded queue between stages, so that the stages can work at the
+    same time.  The items are produced in a separate thread as well.
+    Items come out in the same order either way.
+    """
+    if not threaded:
+        for stage in stages:
+            items = stage(items)
+        return iter(items)
+    return _run_threaded_stages(items, stages, queue_size)
+
+
+def _run_threaded_stages(items, stages, queue_size):
+    stop = threading.Event()
+    queues = [queue.Queue(queue_size) for _ in range(len(stages) + 1)]
+
+    def put(q, item):
+        # Give up if the consumer has stopped, so the thread can exit
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def iter_queue(q):
+        while not stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+
+    def run(stage_items, q_out):
+        try:
+            for item in stage_items:
+                if not put(q_out, item):
+                    return
+        except BaseException as e:
+            put(q_out, _StageError(e))
+            return
+        put(q_out, _DONE)
+
+    threads = [threading.Thread(target=run, args=(items, queues[0]), daemon=True)]
+    for stage, q_in, q_out in zip(stages, queues, queues[1:]):
+        # Stages are called in the thread, in case the stage does
+        # work before it returns the iterator.
+        def stage_items(stage=stage, q_in=q_in):
+            yield from stage(iter_queue(q_in))
+
+        threads.append(
+            threading.Thread(target=run, args=(stage_items(), q_out), daemon=True)
+        )
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,107 @@
+import itertools
+
+QUALITY_METHODS = ["mott", "window"]
+
+# Number of bases in each batch of reads trimmed with NumPy
+QUALITY_BATCH_SIZE = 1024 * 1024
+
+
+class QualityTrimmer:
+    """Find where to cut low quality bases from the 3' end of a read
+
+    Quality strings are compared as bytes, with the Phred offset added
+    to the cutoff, so the scores do not need to be converted first.
+    """
+
+    def __init__(self, cutoff, method="mott", window=4, phred_offset=33):
+        if method not in QUALITY_METHODS:
+            raise ValueError("Unknown quality trimming method: {}".format(method))
+        if window < 1:
+            raise ValueError("Quality window must be positive: {}".format(window))
+        self.cutoff = cutoff
+        self.method = method
+        self.window = window
+        self.phred_offset = phred_offset
+        self.threshold = cutoff + phred_offset
+
+    def trim_lengths(self, qual_buffer, starts, lengths):
+        """Lengths of many reads after quality trimming
+
+        The quality scores of each read are found in the buffer at the
+        given start position, with the reads in order.  With NumPy,
+        reads are trimmed in large batches.  Returns a list of lengths.
+        """
+        try:
+            from .encoded import trim_quality_batch
+        except ImportError:
+            # NumPy is optional
+            return [
+                self.trim_length(qual_buffer[start : start + length])
+                for start, length in zip(starts, lengths)
+            ]
+        import numpy as np
+
+        starts = np.asarray(starts, dtype=np.int64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        trimmed = np.empty_like(lengths)
+        batch_start = 0
+        while batch_start < len(starts):
+            batch_end = np.searchsorted(
+                starts, starts[batch_start] + QUALITY_BATCH_SIZE, side="right"
+            )
+            batch_end = max(batch_end, batch_start + 1)
+            trimmed[batch_start:batch_end] = trim_quality_batch(
+                self,
+                qual_buffer,
+                starts[batch_start:batch_end],
+                lengths[batch_start:batch_end],
+            )
+            batch_start = batch_end
+        return trimmed.tolist()
+
+    def trim_length(self, qual):
+        """Length of the read after quality trimming"""
+        quals = qual.encode("ascii")
+        if self.method == "mott":
+            return mott_trim_length(quals, self.threshold)
+        return window_trim_length(quals, self.threshold, self.window)
+
+
+def mott_trim_length(quals, threshold):
+    """Modified Mott algorithm, as used by BWA and cutadapt
+
+    Working back from the 3' end, we subtract each quality score from
+    the threshold and keep a running sum.  The read is cut where the
+    sum is highest, stopping when the sum drops below zero.  Usually
+    this happens at the first high quality base, so only the low
+    quality end of the read is examined.
+    """
+    running_sum = 0
+    max_sum = 0
+    length = len(quals)
+    for idx in range(len(quals) - 1, -1, -1):
+        running_sum += threshold - quals[idx]
+        if running_sum < 0:
+            break
+        if running_sum > max_sum:
+            max_sum = running_sum
+            length = idx
+    return length
+
+
+def window_trim_length(quals, threshold, window):
+    """Cut the read at the first window with mean quality below the threshold
+
+    Windows are checked from the 5' end, as in Trimmomatic.  Reads
+    shorter than the window are not trimmed.
+    """
+    if (len(quals) < window) or (min(quals) >= threshold):
+        return len(quals)
+    cumulative = list(itertools.accumulate(quals, initial=0))
+    min_sum = threshold * window
+    for idx, (window_start, window_end) in enumerate(
+        zip(cumulative, cumulative[window:])
+    ):
+        if window_end - window_start < min_sum:
+            return idx
+    return len(quals)
@@ -0,0 +1,134 @@
+import itertools
+
+import numpy as np
+
+from .dna import reverse_complement
+from .encoded import BASE_CODES, EncodedReads
+
+
+def encode_seqs(seqs):
+    """Encode a list of sequences as a padded 2D array of base codes
+
+    Returns the array and the length of each sequence.
+    """
+    reads = EncodedReads(seqs)
+    return reads.windows(max(reads.lengths, default=0)), reads.lengths
+
+
+def align_primer(primer, reads, lengths, min_overlap=10):
+    """Align a primer to a batch of encoded reads
+
+    The alignment is local in the read, and global in the primer
+    except that the end of the primer may hang off the end of the
+    read, provided that at least min_overlap bases of the primer are
+    aligned.  Mismatches, insertions, and deletions have unit cost.
+
+    Returns the identity, edit distance, start index, and end index of
+    the best alignment in each read.  Among alignments with the same
+    identity, longer alignments of the primer are preferred, then
+    alignments ending first in the read.
+    """
+    n_reads, max_length = reads.shape
+    rows = np.arange(n_reads)
+    cols = np.arange(max_length + 1, dtype=np.int64)
+    # Each cell of the dynamic programming matrix holds the edit
+    # distance and the start position of the alignment, packed into a
+    # single integer.  Minimizing the packed value minimizes the edit
+    # distance, breaking ties in favor of the earlier start position.
+    s = max_length + 1
+    col_costs = cols * s
+
+    best_identities = np.full(n_reads, -1.0)
+    best_distances = np.zeros(n_reads, dtype=np.int64)
+    best_starts = np.zeros(n_reads, dtype=np.int64)
+    best_ends = np.zeros(n_reads, dtype=np.int64)
+
+    def update_best(aligned_primer_length, packed, ends):
+        distances = packed // s
+        starts = packed % s
+        aligned_lengths = np.maximum(ends - starts, aligned_primer_length)
+        identities = 1 - distances / aligned_lengths
+        is_better = identities >= best_identities
+        best_identities[is_better] = identities[is_better]
+        best_distances[is_better] = distances[is_better]
+        best_starts[is_better] = starts[is_better]
+        best_ends[is_better] = ends[is_better]
+
+    # Alignments may start anywhere in the read at no cost
+    prev = np.broadcast_to(cols, (n_reads, max_length + 1))
+    primer_codes = BASE_CODES[np.frombuffer(primer.encode("ascii"), dtype=np.uint8)]
+    for i, base in enumerate(primer_codes, start=1):
+        mismatch_costs = (reads != base) * s
+        row = np.empty((n_reads, max_length + 1), dtype=np.int64)
+        row[:, 0] = i * s
+        # Match or mismatch, versus a primer base missing from the read
+        np.minimum(prev[:, :-1] + mismatch_costs, prev[:, 1:] + s, out=row[:, 1:])
+        # Extra bases in the read: the cost to reach column j from
+        # column k is (j - k), so we take a running minimum of
+        # (row[k] - k) and add j back.
+        row -= col_costs
+        np.minimum.accumulate(row, axis=1, out=row)
+        row += col_costs
+        prev = row
+
+        # The rest of the primer may hang off the end of the read
+        if min(min_overlap, len(primer)) <= i < len(primer):
+            update_best(i, prev[rows, lengths], lengths)
+
+    # Complete alignments must end inside the read, after at least
+    # one base
+    packed = prev.copy()
+    outside_read = (cols[np.newaxis, :] > lengths[:, np.newaxis]) | (cols == 0)
+    packed[outside_read] = np.iinfo(np.int64).max
+    ends = np.argmin(packed // s, axis=1)
+    update_best(len(primer), packed[rows, ends], ends)
+
+    return best_identities, best_distances, best_starts, best_ends
+
+
+class SemiglobalAligner:
+    def __init__(self, primers, min_id=0.85, match_reverse_complement=True):
+        primers = list(primers)
+        self.primers = primers.copy()
+        if match_reverse_complement:
+            for primer in primers:
+                self.primers.append(reverse_complement(primer))
+        self.min_id = min_id
+
+    def search(self, seqs, batch_size=1000):
+        """Search seqs and yield (seq_id, start, end, edit distance) of hits
+
+        For each read, the primer alignment with the highest identity
+        is reported.
+        """
+        seqs = iter(seqs)
+        while True:
+            batch = list(itertools.islice(seqs, batch_size))
+            if not batch:
+                return
+            yield from self._search_batch(batch)
+
+    def _search_batch(self, batch):
+        seq_ids = [seq_id for seq_id, _ in batch]
+        reads, lengths = encode_seqs([seq for _, seq in batch])
+
+        best_identities = np.full(len(batch), -1.0)
+        best_distances = np.zeros(len(batch), dtype=np.int64)
+        best_starts = np.zeros(len(batch), dtype=np.int64)
+        best_ends = np.zeros(len(batch), dtype=np.int64)
+        for primer in self.primers:
+            identities, distances, starts, ends = align_primer(primer, reads, lengths)
+            # Earlier primers win ties
+            is_better = identities > best_identities
+            best_identities[is_better] = identities[is_better]
+            best_distances[is_better] = distances[is_better]
+            best_starts[is_better] = starts[is_better]
+            best_ends[is_better] = ends[is_better]
+
+        for n in np.flatnonzero(best_identities >= self.min_id):
+            yield (
+                seq_ids[n],
+                int(best_starts[n]),
+                int(best_ends[n]),
+                int(best_distances[n]),
+            )
@@ -0,0 +1,104 @@
+import collections
+import contextlib
+import itertools
+import json
+import os
+import sys
+import time
+
+
+def cpu_time():
+    """CPU time used by this process and its finished child processes"""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def peak_rss_mb(children=False):
+    """Peak resident memory of this process, or its largest child process"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    maxrss = resource.getrusage(who).ru_maxrss
+    # Reported in bytes on macOS, kilobytes elsewhere
+    if sys.platform == "darwin":
+        return maxrss / (1024 * 1024)
+    return maxrss / 1024
+
+
+class RunStats:
+    """Wall time, CPU time, and read counts for each stage of trimming
+
+    For matching stages, reads_in is the number of reads searched, and
+    reads_out is the number of reads matched.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.match_counts = collections.Counter()
+        self.start_wall_time = time.perf_counter()
+        self.start_cpu_time = cpu_time()
+
+    def get_stage(self, stage):
+        if stage not in self.stages:
+            self.stages[stage] = {
+                "wall_seconds": 0.0,
+                "cpu_seconds": 0.0,
+                "reads_in": 0,
+                "reads_out": 0,
+            }
+        return self.stages[stage]
+
+    @contextlib.contextmanager
+    def time_stage(self, stage):
+        """Add the time spent in the block to a stage
+
+        Yields the dict of stage stats, so read counts can be added.
+        """
+        stage_stats = self.get_stage(stage)
+        start_wall_time = time.perf_counter()
+        start_cpu_time = cpu_time()
+        try:
+            yield stage_stats
+        finally:
+            stage_stats["wall_seconds"] += time.perf_counter() - start_wall_time
+            stage_stats["cpu_seconds"] += cpu_time() - start_cpu_time
+
+    def timed_iter(self, stage, items, block_size=1000):
+        """Add the time spent producing items to a stage
+
+        Items are produced in blocks, so the cost of timing is small
+        compared to the cost of producing each item.
+        """
+        items = iter(items)
+        while True:
+            with self.time_stage(stage) as stage_stats:
+                block = list(itertools.islice(items, block_size))
+                stage_stats["reads_in"] += len(block)
+                stage_stats["reads_out"] += len(block)
+            if not block:
+                return
+            yield from block
+
+    def update(self, other):
+        """Add the stats from another RunStats object"""
+        for stage, other_stage_stats in other.stages.items():
+            stage_stats = self.get_stage(stage)
+            for key, val in other_stage_stats.items():
+                stage_stats[key] += val
+        self.match_counts.update(other.match_counts)
+
+    def to_dict(self):
+        return {
+            "wall_seconds": time.perf_counter() - self.start_wall_time,
+            "cpu_seconds": cpu_time() - self.start_cpu_time,
+            "stages": self.stages,
+            "match_counts": dict(self.match_counts),
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_child_rss_mb": peak_rss_mb(children=True),
+        }
+
+    def write(self, f):
+        json.dump(self.to_dict(), f, indent=2)
+        f.write("\n")
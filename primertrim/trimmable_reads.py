@@ -1,52 +1,226 @@
+import array
+import collections
+import itertools
+
+from .fastq import parse_fastq
+from .matcher import PrimerMatch
+from .stats import RunStats
+
+BUFFER_PIECE_READS = 10000
+
+
 class TrimmableReads:
+    """Reads from a FASTQ file, along with the primer match for each read
+
+    Reads are addressed by their position in the file.  Each field is
+    stored in one string, with the reads placed end to end, and
+    matches are stored in parallel arrays.  The observed primer is
+    stored as a length, because it is the part of the read starting
+    where the match starts.
+    """
+
     def __init__(self, reads):
-        self.descs = {}
-        self.seqs = {}
-        self.quals = {}
-        self.matches = {}
+        # Each field is collected in pieces of BUFFER_PIECE_READS reads
+        # as the reads arrive, so the reads are never all held as
+        # separate strings.
+        desc_pieces, seq_pieces, qual_pieces = [], [], []
+        descs, seqs, quals = [], [], []
+        self.desc_offsets = array.array("q", [0])
+        # Sequence and quality share the same offsets
+        self.seq_offsets = array.array("q", [0])
+        desc_end = 0
+        seq_end = 0
+        read_ids = set()
         for desc, seq, qual in reads:
             read_id = get_read_id(desc)
-            if read_id in self.descs:
-                raise ValueError("Duplicate read ID: {}", format(read_id))
-            self.descs[read_id] = desc
-            self.seqs[read_id] = seq
-            self.quals[read_id] = qual
-            self.matches[read_id] = None
+            if read_id in read_ids:
+                raise ValueError("Duplicate read ID: {}".format(read_id))
+            read_ids.add(read_id)
+            if len(seq) != len(qual):
+                raise ValueError(
+                    "Sequence and quality have different lengths: {}".format(read_id)
+                )
+            descs.append(desc)
+            seqs.append(seq)
+            quals.append(qual)
+            desc_end += len(desc)
+            seq_end += len(seq)
+            self.desc_offsets.append(desc_end)
+            self.seq_offsets.append(seq_end)
+            if len(seqs) == BUFFER_PIECE_READS:
+                desc_pieces.append("".join(descs))
+                seq_pieces.append("".join(seqs))
+                qual_pieces.append("".join(quals))
+                descs.clear()
+                seqs.clear()
+                quals.clear()
+        del read_ids
+        desc_pieces.append("".join(descs))
+        seq_pieces.append("".join(seqs))
+        qual_pieces.append("".join(quals))
+        del descs, seqs, quals
+
+        # Join one buffer at a time, to limit the peak memory
+        self.desc_buffer = "".join(desc_pieces)
+        del desc_pieces
+        self.seq_buffer = "".join(seq_pieces)
+        del seq_pieces
+        self.qual_buffer = "".join(qual_pieces)
+        del qual_pieces
+
+        num_reads = len(self.seq_offsets) - 1
+        # Method code is the index in self.methods, or -1 for no match
+        self.methods = []
+        self.method_codes = array.array("b", [-1]) * num_reads
+        self.match_starts = array.array("i", [0]) * num_reads
+        self.match_mismatches = array.array("i", [-1]) * num_reads
+        self.primer_lengths = array.array("i", [-1]) * num_reads
+        # Observed primers that are not part of the read, if any
+        self.other_primerseqs = {}
+        # Shrinks as reads are matched
+        self.unmatched = array.array("i", range(num_reads))
+        # Set if reads are trimmed for quality
+        self.quality_lengths = None
+        self.stats = RunStats()
 
     @classmethod
     def from_fastq(cls, f):
         return cls(parse_fastq(f))
 
+    def __len__(self):
+        return len(self.method_codes)
+
+    def get_desc(self, idx):
+        return self.desc_buffer[self.desc_offsets[idx] : self.desc_offsets[idx + 1]]
+
+    def get_seq(self, idx):
+        return self.seq_buffer[self.seq_offsets[idx] : self.seq_offsets[idx + 1]]
+
+    def get_match(self, idx):
+        """Returns a PrimerMatch object or None"""
+        method_code = self.method_codes[idx]
+        if method_code < 0:
+            return None
+        start = self.match_starts[idx]
+        mismatches = self.match_mismatches[idx]
+        primer_length = self.primer_lengths[idx]
+        if idx in self.other_primerseqs:
+            primerseq = self.other_primerseqs[idx]
+        elif primer_length < 0:
+            primerseq = None
+        else:
+            seq_start = self.seq_offsets[idx] + start
+            primerseq = self.seq_buffer[seq_start : seq_start + primer_length]
+        return PrimerMatch(
+            self.methods[method_code],
+            start,
+            mismatches if mismatches >= 0 else None,
+            primerseq,
+        )
+
     def get_unmatched_seqs(self):
-        for read_id, match in self.matches.items():
-            if match is None:
-                yield read_id, self.seqs[read_id]
-
-    def register_match(self, read_id, matchobj):
-        self.matches[read_id] = matchobj
-
-    def output_reads(self, min_length=0):
-        for read_id in self.descs.keys():
-            matchobj = self.matches[read_id]
-            desc = self.descs[read_id]
-            seq = self.seqs[read_id]
-            qual = self.quals[read_id]
-            if matchobj is not None:
-                seq = seq[: matchobj.start]
-                qual = qual[: matchobj.start]
-            if len(seq) >= min_length:
+        """Yield the index and sequence of each read without a match"""
+        method_codes = self.method_codes
+        self.unmatched = array.array(
+            "i", [idx for idx in self.unmatched if method_codes[idx] < 0]
+        )
+        buffer = self.seq_buffer
+        offsets = self.seq_offsets
+        for idx in self.unmatched:
+            yield idx, buffer[offsets[idx] : offsets[idx + 1]]
+
+    def register_match(self, idx, matchobj):
+        if matchobj.method not in self.methods:
+            self.methods.append(matchobj.method)
+        self.method_codes[idx] = self.methods.index(matchobj.method)
+        self.match_starts[idx] = matchobj.start
+        if matchobj.mismatches is not None:
+            self.match_mismatches[idx] = matchobj.mismatches
+        if matchobj.primerseq is not None:
+            seq_start = self.seq_offsets[idx] + matchobj.start
+            seq_end = self.seq_offsets[idx + 1]
+            if self.seq_buffer.startswith(matchobj.primerseq, seq_start, seq_end):
+                self.primer_lengths[idx] = len(matchobj.primerseq)
+            else:
+                self.other_primerseqs[idx] = matchobj.primerseq
+
+    def apply_matchers(self, matchers):
+        for m in matchers:
+            with self.stats.time_stage(m.stage) as stage_stats:
+                # Sequences are passed to the matcher one at a time, so
+                # that they are not all copied out of the buffer at once.
+                unmatched_seqs = _count_items(
+                    self.get_unmatched_seqs(), stage_stats, "reads_in"
+                )
+                matches_found = m.find_in_seqs(unmatched_seqs)
+                for idx, matchobj in matches_found:
+                    if matchobj is not None:
+                        self.register_match(idx, matchobj)
+                        stage_stats["reads_out"] += 1
+
+    def trim_quality(self, trimmer):
+        """Trim low quality bases from the reads, after removing primers
+
+        Returns the number of reads shortened.
+        """
+        lengths = [self._primer_trimmed_length(idx) for idx in range(len(self))]
+        quality_lengths = trimmer.trim_lengths(
+            self.qual_buffer, self.seq_offsets[:-1], lengths
+        )
+        self.quality_lengths = array.array("i", quality_lengths)
+        return sum(
+            quality_length < length
+            for quality_length, length in zip(quality_lengths, lengths)
+        )
+
+    def trimmed_length(self, idx):
+        if self.quality_lengths is not None:
+            return self.quality_lengths[idx]
+        return self._primer_trimmed_length(idx)
+
+    def _primer_trimmed_length(self, idx):
+        if self.method_codes[idx] < 0:
+            return self.seq_offsets[idx + 1] - self.seq_offsets[idx]
+        return self.match_starts[idx]
+
+    def match_counts(self):
+        code_counts = collections.Counter(self.method_codes)
+        return collections.Counter(
+            {
+                "No match" if code < 0 else self.methods[code]: count
+                for code, count in code_counts.items()
+            }
+        )
+
+    def output_reads(self, min_length=0, max_n=None):
+        for desc, seq, qual in self.trimmed_reads():
+            if passes_filters(seq, min_length, max_n):
                 yield (desc, seq, qual)
 
+    def trimmed_reads(self):
+        desc_buffer = self.desc_buffer
+        seq_buffer = self.seq_buffer
+        qual_buffer = self.qual_buffer
+        desc_offsets = self.desc_offsets
+        seq_offsets = self.seq_offsets
+        for idx in range(len(self)):
+            desc = desc_buffer[desc_offsets[idx] : desc_offsets[idx + 1]]
+            start = seq_offsets[idx]
+            end = start + self.trimmed_length(idx)
+            yield (desc, seq_buffer[start:end], qual_buffer[start:end])
+
     def output_loginfo(self):
-        for read_id, matchobj in self.matches.items():
-            if matchobj is None:
-                seq = self.seqs[read_id]
-                yield (read_id, "No match", len(seq), None, None)
+        for idx, method_code in enumerate(self.method_codes):
+            read_id = get_read_id(self.get_desc(idx))
+            trimmed_length = self.trimmed_length(idx)
+            if method_code < 0:
+                yield (read_id, "No match", trimmed_length, None, None)
             else:
+                matchobj = self.get_match(idx)
                 yield (
                     read_id,
                     matchobj.method,
-                    matchobj.start,
+                    trimmed_length,
                     matchobj.mismatches,
                     matchobj.primerseq,
                 )
@@ -60,20 +234,56 @@ class TrimmableReads:
     ]
 
 
-def parse_fastq(f):
-    for desc, seq, _, qual in _grouper(f, 4):
-        desc = desc.rstrip()[1:]
-        seq = seq.rstrip()
-        qual = qual.rstrip()
-        yield (desc, seq, qual)
+def passes_filters(seq, min_length=0, max_n=None):
+    """Check if a trimmed read should be written to the output"""
+    if len(seq) < min_length:
+        return False
+    if (max_n is not None) and (seq.count("N") > max_n):
+        return False
+    return True
 
 
-def _grouper(iterable, n):
-    "Collect data into fixed-length chunks or blocks"
-    # grouper('ABCDEFG', 3) --> ABC DEF
-    args = [iter(iterable)] * n
-    return zip(*args)
+def _count_items(items, counts, key):
+    for item in items:
+        counts[key] += 1
+        yield item
+
+
+def zip_mates(read_iters):
+    """Iterate over reads from several FASTQ files in lockstep
+
+    Yields a tuple with one read from each file.  Raises an error if
+    the read IDs do not match, or if the files have different numbers
+    of reads.
+    """
+    for mates in itertools.zip_longest(*read_iters):
+        if None in mates:
+            raise ValueError("FASTQ files have different numbers of reads")
+        pair_ids = [get_pair_id(desc) for desc, _, _ in mates]
+        if len(set(pair_ids)) > 1:
+            raise ValueError("Read IDs do not match: {}".format(", ".join(pair_ids)))
+        yield mates
+
+
+def chunk_reads(reads, chunk_size):
+    "Collect reads into lists of at most chunk_size reads"
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be positive: {}".format(chunk_size))
+    reads = iter(reads)
+    while True:
+        chunk = list(itertools.islice(reads, chunk_size))
+        if not chunk:
+            return
+        yield chunk
 
 
 def get_read_id(desc):
     return desc.split(maxsplit=1)[0]
+
+
+def get_pair_id(desc):
+    "Read ID without the /1 or /2 suffix used in older Illumina reads"
+    read_id = get_read_id(desc)
+    if read_id.endswith(("/1", "/2")):
+        return read_id[:-2]
+    return read_id
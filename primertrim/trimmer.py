@@ -0,0 +1,80 @@
+import collections
+
+from .engines import build_matchers, deambiguate_primers
+from .matcher import AlignmentMatcher, MemoizedMatcher, ShortReadMatcher
+from .parallel import DEFAULT_PARALLEL_CHUNK_SIZE, match_chunks
+from .trimmable_reads import chunk_reads, passes_filters
+
+TrimmedRead = collections.namedtuple(
+    "TrimmedRead", ["desc", "seq", "qual", "match", "filtered"]
+)
+
+
+class PrimerTrimmer:
+    """Trim primers from reads inside a Python program
+
+    The matchers are built once, when the trimmer is created, and can
+    be used for any number of read iterators.  Options have the same
+    meaning and defaults as for the ptrim command.  For alignment, give
+    the name of the alignment backend ("vsearch" or "builtin").
+    Quality trimming is done if a QualityTrimmer is given.
+    """
+
+    def __init__(
+        self,
+        primers,
+        mismatches=1,
+        min_partial=8,
+        match_reverse_complement=True,
+        engine="python",
+        alignment=None,
+        align_id=0.85,
+        min_length=50,
+        max_n=None,
+        quality_trimmer=None,
+        dedup_cache_size=0,
+        chunk_size=DEFAULT_PARALLEL_CHUNK_SIZE,
+        jobs=1,
+    ):
+        matchers = build_matchers(
+            primers, mismatches, min_partial, match_reverse_complement, engine
+        )
+        if dedup_cache_size > 0:
+            matchers = [MemoizedMatcher(m, dedup_cache_size) for m in matchers]
+        if min_length > 0:
+            matchers.insert(0, ShortReadMatcher(min_length))
+        self.matchers = matchers
+        if alignment is None:
+            self.alignment_matchers = []
+        else:
+            self.alignment_matchers = [
+                AlignmentMatcher(
+                    deambiguate_primers(primers), None, align_id, backend=alignment
+                )
+            ]
+        self.min_length = min_length
+        self.max_n = max_n
+        self.quality_trimmer = quality_trimmer
+        self.chunk_size = chunk_size
+        self.jobs = jobs
+
+    def trim(self, reads, keep_filtered=False):
+        """Trim an iterable of (desc, seq, qual) records
+
+        Yields a TrimmedRead for each read, in the order the reads were
+        given.  The match attribute holds the PrimerMatch for the read,
+        or None if no primer was found.  Reads that fail the length or
+        N filters are left out, unless keep_filtered is set, in which
+        case they are marked as filtered.  Reads are processed in
+        chunks, so only one chunk is held in memory at a time.
+        """
+        chunks = chunk_reads(reads, self.chunk_size)
+        for trimmable_reads in match_chunks(chunks, self.matchers, self.jobs):
+            trimmable_reads.apply_matchers(self.alignment_matchers)
+            if self.quality_trimmer is not None:
+                trimmable_reads.trim_quality(self.quality_trimmer)
+            for idx, (desc, seq, qual) in enumerate(trimmable_reads.trimmed_reads()):
+                filtered = not passes_filters(seq, self.min_length, self.max_n)
+                if keep_filtered or not filtered:
+                    matchobj = trimmable_reads.get_match(idx)
+                    yield TrimmedRead(desc, seq, qual, matchobj, filtered)
@@ -0,0 +1,37 @@
+import io
+
+from primertrim.align import VsearchAligner, write_fasta
+
+
+def test_write_fasta():
+    f = io.StringIO()
+    write_fasta(f, [("a", "ACGT"), ("b", "GGCC")])
+    assert f.getvalue() == ">a\nACGT\n>b\nGGCC\n"
+
+
+def test_parse():
+    a = VsearchAligner("primers.fa")
+    f = io.StringIO(
+        "# comment line\n"
+        "read1\tseq0\t90.0\t10\t1\t0\t3\t12\t1\t10\t30\t20\tACGT\tACGA\t+\n"
+        "\n"
+    )
+    assert list(a.parse(f)) == [
+        {
+            "qseqid": "read1",
+            "sseqid": "seq0",
+            "pident": 90.0,
+            "length": 10,
+            "mismatch": 1,
+            "gapopen": 0,
+            "qstart": 3,
+            "qend": 12,
+            "sstart": 1,
+            "send": 10,
+            "qlen": 30,
+            "slen": 20,
+            "qseq": "ACGT",
+            "sseq": "ACGA",
+            "qstrand": "+",
+        }
+    ]
@@ -0,0 +1,39 @@
+from primertrim.automaton import AhoCorasick, PrefixTrie
+
+
+def test_iter_matches():
+    a = AhoCorasick(["he", "she", "his", "hers"])
+    assert list(a.iter_matches("ushers")) == [(3, "she"), (3, "he"), (5, "hers")]
+
+
+def test_overlapping_matches():
+    a = AhoCorasick(["AAA", "AA"])
+    assert list(a.iter_matches("AAAA")) == [
+        (1, "AA"),
+        (2, "AAA"),
+        (2, "AA"),
+        (3, "AAA"),
+        (3, "AA"),
+    ]
+
+
+def test_no_patterns():
+    a = AhoCorasick([])
+    assert list(a.iter_matches("ACGT")) == []
+
+
+def test_find_prefix():
+    t = PrefixTrie(["ACGT", "AC", "ACG", "GG"])
+    assert t.find_prefix("ACGTTT") == 0
+    assert t.find_prefix("ACGAAA") == 1
+    assert t.find_prefix("GGG") == 3
+    assert t.find_prefix("TACGT") is None
+    assert t.find_prefix("A") is None
+
+
+def test_find_prefix_priority():
+    # Earlier patterns win, even if they are longer
+    t = PrefixTrie(["ACG", "AC", "ACG"])
+    assert t.find_prefix("ACGT") == 0
+    t = PrefixTrie(["AC", "ACG"])
+    assert t.find_prefix("ACGT") == 0
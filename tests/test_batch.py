@@ -0,0 +1,108 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from primertrim.batch import (
+    main,
+    parse_manifest,
+    sample_name,
+    samples_from_glob,
+    summary_path,
+)
+from primertrim.command import main as command_main
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def read_from(filepath):
+    with open(filepath) as f:
+        res = f.readlines()
+    return res
+
+
+def test_parse_manifest():
+    f = io.StringIO(
+        "# comment\n"
+        "a.fastq\ta_trimmed.fastq\ta.log\n"
+        "\n"
+        "b.fastq\tb_trimmed.fastq\n"
+    )
+    assert list(parse_manifest(f)) == [
+        ("a.fastq", "a_trimmed.fastq", "a.log"),
+        ("b.fastq", "b_trimmed.fastq", None),
+    ]
+
+
+def test_parse_manifest_bad_line():
+    with pytest.raises(ValueError):
+        list(parse_manifest(io.StringIO("a.fastq\n")))
+
+
+def test_sample_name():
+    assert sample_name("s1.fastq.gz") == "s1"
+    assert sample_name("s1.fq") == "s1"
+    assert sample_name("s1.txt") == "s1.txt"
+
+
+def test_samples_from_glob(tmp_path):
+    for filename in ["s2.fastq.gz", "s1.fastq", "notes.txt"]:
+        (tmp_path / filename).touch()
+    out_dir = tmp_path / "out"
+    assert list(samples_from_glob(str(tmp_path / "*.fastq*"), str(out_dir))) == [
+        (
+            str(tmp_path / "s1.fastq"),
+            str(out_dir / "s1.fastq"),
+            str(out_dir / "s1.log"),
+        ),
+        (
+            str(tmp_path / "s2.fastq.gz"),
+            str(out_dir / "s2.fastq.gz"),
+            str(out_dir / "s2.log"),
+        ),
+    ]
+
+
+def test_summary_path():
+    assert summary_path("out/s1.log") == "out/s1.summary.json"
+    assert summary_path("out/s1.log.gz") == "out/s1.summary.json"
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_main_script(tmp_path, workers):
+    input_fp = str(DATA_DIR / "example.fastq")
+    args = ["GCATCGATGAAGAACGCAGC", "--min-partial", "10"]
+
+    expected_output_fp = str(tmp_path / "expected.fastq")
+    expected_log_fp = str(tmp_path / "expected.log")
+    command_main(
+        args + ["-i", input_fp, "-o", expected_output_fp, "--log", expected_log_fp]
+    )
+
+    manifest_fp = tmp_path / "manifest.tsv"
+    samples = []
+    for n in range(3):
+        output_fp = str(tmp_path / "out" / "s{}.fastq".format(n))
+        log_fp = str(tmp_path / "out" / "s{}.log".format(n))
+        samples.append((output_fp, log_fp))
+    manifest_fp.write_text(
+        "".join("{}\t{}\t{}\n".format(input_fp, *sample) for sample in samples)
+    )
+    main(args + ["--manifest", str(manifest_fp), "--workers", workers])
+
+    for output_fp, log_fp in samples:
+        assert read_from(output_fp) == read_from(expected_output_fp)
+        assert read_from(log_fp) == read_from(expected_log_fp)
+
+
+def test_main_script_log_summaries(tmp_path):
+    input_fp = tmp_path / "s1.fastq"
+    input_fp.write_bytes((DATA_DIR / "example.fastq").read_bytes())
+    out_dir = tmp_path / "out"
+    main(
+        ["GCATCGATGAAGAACGCAGC", "--input-glob", str(tmp_path / "*.fastq")]
+        + ["--output-dir", str(out_dir), "--log-summaries"]
+    )
+    summary = json.loads((out_dir / "s1.summary.json").read_text())
+    assert summary["reads"] == len(read_from(out_dir / "s1.log")) - 1
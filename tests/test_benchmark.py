@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from primertrim.benchmark import compare_results, main, simulate_reads
+from primertrim.dna import reverse_complement
+
+
+def test_simulate_reads():
+    reads = list(
+        simulate_reads(
+            ["ACGTACGTACGTRR"],
+            20,
+            50,
+            primer_fraction=1.0,
+            primer_start_range=(10, 10),
+            seed=1,
+        )
+    )
+    assert len(reads) == 20
+    for desc, seq, qual in reads:
+        assert len(seq) == len(qual) == 50
+        assert seq[10:22] == "ACGTACGTACGT"
+        assert seq[22:24] in ["AA", "AG", "GA", "GG"]
+    assert list(simulate_reads(["ACGT"], 5, 10, seed=1)) == list(
+        simulate_reads(["ACGT"], 5, 10, seed=1)
+    )
+
+
+def test_simulate_reads_revcomp_cut_off():
+    primer = "ACGTTTGGCC"
+    reads = simulate_reads(
+        [primer],
+        5,
+        20,
+        primer_fraction=1.0,
+        primer_start_range=(15, 15),
+        revcomp_fraction=1.0,
+    )
+    for desc, seq, qual in reads:
+        assert seq[15:] == reverse_complement(primer)[:5]
+
+
+def test_simulate_reads_bad_start_range():
+    with pytest.raises(ValueError):
+        list(simulate_reads(["ACGT"], 5, 10, primer_start_range=(0, 11)))
+
+
+def test_compare_results():
+    baseline = {
+        "stages": {
+            "parse": {"seconds": 1.0, "reads_per_sec": 1000.0},
+            "complete": {"seconds": 1.0, "reads_per_sec": 1000.0},
+        }
+    }
+    results = {
+        "stages": {
+            "parse": {"seconds": 1.1, "reads_per_sec": 900.0},
+            "complete": {"seconds": 2.0, "reads_per_sec": 500.0},
+            "partial": {"seconds": 1.0, "reads_per_sec": 1000.0},
+        }
+    }
+    assert compare_results(results, baseline, 0.2) == [("complete", 0.5)]
+
+
+def test_main(tmp_path, capsys):
+    output_fp = tmp_path / "baseline.json"
+    args = ["GCATCGATGAARAAYGCAGC", "--num-reads", "100", "--repeat", "1"]
+    main(args + ["--output", str(output_fp)])
+    with open(output_fp) as f:
+        results = json.load(f)
+    assert list(results["stages"]) == ["parse", "complete", "partial", "write"]
+
+    main(args + ["--baseline", str(output_fp), "--tolerance", "1"])
+    assert "complete" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize(
+    "extra_args",
+    [
+        ["--max-primer-start", "101"],
+        ["--min-primer-start", "-1"],
+        ["--min-primer-start", "20", "--max-primer-start", "10"],
+    ],
+)
+def test_main_bad_primer_start(extra_args):
+    args = ["GCATCGATGAARAAYGCAGC", "--num-reads", "10", "--read-length", "100"]
+    with pytest.raises(SystemExit):
+        main(args + extra_args)
@@ -0,0 +1,67 @@
+from primertrim.bitparallel import (
+    BitParallelCompleteMatcher,
+    BitParallelPartialMatcher,
+    degenerate_queries,
+    variant_index,
+)
+from primertrim.dna import deambiguate
+from primertrim.matcher import CompleteMatcher, PartialMatcher, PrimerMatch
+
+PRIMERS = ["ACRTACGYACGT", "TAMCTNC"]
+
+SEQS = [
+    ("a", "TTTACGTACGTACGTTT"),
+    ("b", "TTTACATACCTACGTTT"),
+    ("c", "TTTACGTANCTACGTTT"),
+    ("d", "ACGTAC"),
+    ("e", "GGGGGGGGACGTACG"),
+    ("f", "CGTACGTGGGGGGGG"),
+    ("g", "GGGTACCTGCGGGG"),
+    ("h", "GGGGCAGGTAGGG"),
+    ("i", "TTTGTAGGTAGGG"),
+    ("j", ""),
+]
+
+
+def test_degenerate_queries():
+    forward, reverse = degenerate_queries(["ACR"])
+    assert forward.seq == "ACR"
+    assert forward.choices == ["A", "C", "AG"]
+    assert reverse.seq == "YGT"
+    assert reverse.choices == ["TC", "G", "T"]
+    assert reverse.choice_order == (2, 1, 0)
+
+
+def test_variant_index():
+    forward, reverse = degenerate_queries(["NAR"])
+    # GAG is variant 3 * 2 + 1 of NAR
+    assert deambiguate("NAR")[7] == "GAG"
+    assert variant_index(forward, "GAG", 0) == (3, 0, 1)
+    assert variant_index(reverse, "CTC", 0) == (3, 0, 1)
+    # Positions outside the read take the first base
+    assert variant_index(forward, "AG", -1) == (0, 0, 1)
+
+
+def test_bitparallel_complete_matcher():
+    m = BitParallelCompleteMatcher(["ACRT"], 0)
+    assert m.find_match("GGACGTGG") == PrimerMatch("Complete", 2, 0, "ACGT")
+    assert m.find_match("GGACGAGG") is None
+    assert m.find_match("GGATYTGG") is None
+    # Reverse complement is AYGT
+    assert m.find_match("GGATGTGG") == PrimerMatch("Complete", 2, 0, "ATGT")
+
+
+def test_bitparallel_complete_matcher_same_as_expanded():
+    queries = [q for p in PRIMERS for q in deambiguate(p)]
+    for max_mismatch in range(4):
+        m = CompleteMatcher(queries, max_mismatch)
+        bm = BitParallelCompleteMatcher(PRIMERS, max_mismatch)
+        assert list(bm.find_in_seqs(SEQS)) == list(m.find_in_seqs(SEQS))
+
+
+def test_bitparallel_partial_matcher_same_as_expanded():
+    queries = [q for p in PRIMERS for q in deambiguate(p)]
+    for min_length in [3, 4, 6]:
+        m = PartialMatcher(queries, min_length)
+        bm = BitParallelPartialMatcher(PRIMERS, min_length)
+        assert list(bm.find_in_seqs(SEQS)) == list(m.find_in_seqs(SEQS))
@@ -0,0 +1,35 @@
+from primertrim.cache import cache_key, load_or_build
+
+
+class Builder:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"built": self.calls}
+
+
+def test_cache_key():
+    assert cache_key(["ACGT", 1]) == cache_key(["ACGT", 1])
+    assert cache_key(["ACGT", 1]) != cache_key(["ACGT", 2])
+
+
+def test_load_or_build(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    build = Builder()
+    assert load_or_build(cache_dir, ["ACGT", 1], build) == {"built": 1}
+    # Second call loads from the cache
+    assert load_or_build(cache_dir, ["ACGT", 1], build) == {"built": 1}
+    assert build.calls == 1
+    # Different key data is built again
+    assert load_or_build(cache_dir, ["ACGT", 2], build) == {"built": 2}
+    assert build.calls == 2
+
+
+def test_load_or_build_corrupt_file(tmp_path):
+    build = Builder()
+    load_or_build(str(tmp_path), ["ACGT"], build)
+    for fp in tmp_path.iterdir():
+        fp.write_bytes(b"not a pickle")
+    assert load_or_build(str(tmp_path), ["ACGT"], build) == {"built": 2}
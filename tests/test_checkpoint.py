@@ -0,0 +1,38 @@
+import pytest
+
+from primertrim.checkpoint import (
+    remove_checkpoint,
+    resume_from_checkpoint,
+    write_checkpoint,
+)
+from primertrim.logfile import LogSummary
+
+
+def test_checkpoint(tmp_path):
+    checkpoint_fp = str(tmp_path / "checkpoint.json")
+    assert resume_from_checkpoint(checkpoint_fp, "key", (0, None)) is None
+
+    output_fp = tmp_path / "out.fastq"
+    output_fp.write_text("abc")
+    summary = LogSummary()
+    summary.update([("a", "Complete", 10, 1, "ACGT")])
+    write_checkpoint(
+        checkpoint_fp, "key", (0, None), 5, [str(output_fp), None], [summary]
+    )
+
+    # Anything written after the checkpoint is removed
+    output_fp.write_text("abcdef")
+    state = resume_from_checkpoint(checkpoint_fp, "key", (0, None))
+    assert state["records_done"] == 5
+    assert output_fp.read_text() == "abc"
+    restored = LogSummary.from_dict(state["summaries"][0])
+    assert restored.to_dict() == summary.to_dict()
+
+    with pytest.raises(ValueError):
+        resume_from_checkpoint(checkpoint_fp, "key", (0, 100))
+    with pytest.raises(ValueError):
+        resume_from_checkpoint(checkpoint_fp, "other key", (0, None))
+
+    remove_checkpoint(checkpoint_fp)
+    assert resume_from_checkpoint(checkpoint_fp, "other key", (0, None)) is None
+    remove_checkpoint(checkpoint_fp)
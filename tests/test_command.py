@@ -1,6 +1,14 @@
+import gzip
+import json
+import os
+import pstats
 from pathlib import Path
 
+import pytest
+
+from primertrim.checkpoint import write_checkpoint
 from primertrim.command import main
+from primertrim.fastq_index import main as index_main
 
 DATA_DIR = Path(__file__).parent / "data"
 
@@ -38,3 +46,342 @@ def test_main_script(tmp_path):
 
     expected_output_fp = str(DATA_DIR / "trimmed_example.fastq")
     assert read_from(output_fp) == read_from(expected_output_fp)
+
+
+def test_main_script_chunked(tmp_path):
+    input_fp = str(DATA_DIR / "example.fastq")
+    args = ["GCATCGATGAAGAACGCAGC", "-i", input_fp, "--min-partial", "10"]
+
+    output_fp = str(tmp_path / "out.fastq")
+    log_fp = str(tmp_path / "out.log")
+    main(args + ["-o", output_fp, "--log", log_fp])
+
+    chunked_output_fp = str(tmp_path / "chunked.fastq")
+    chunked_log_fp = str(tmp_path / "chunked.log")
+    main(args + ["-o", chunked_output_fp, "--log", chunked_log_fp, "--chunk-size", "3"])
+
+    assert read_from(chunked_log_fp) == read_from(log_fp)
+    assert read_from(chunked_output_fp) == read_from(output_fp)
+
+
+@pytest.mark.parametrize(
+    "extra_args",
+    [
+        pytest.param(["--engine", "numpy"], id="numpy"),
+        pytest.param(["--engine", "bitparallel"], id="bitparallel"),
+        pytest.param(["--engine", "adaptive"], id="adaptive"),
+        pytest.param(["--jobs", "2", "--chunk-size", "100"], id="jobs"),
+        pytest.param(["--pipeline", "--chunk-size", "100"], id="pipeline"),
+    ],
+)
+def test_main_script_same_output(tmp_path, extra_args):
+    # Engines and ways of running give the same output as the default
+    if "numpy" in extra_args:
+        pytest.importorskip("numpy")
+    input_fp = str(DATA_DIR / "example.fastq")
+    args = ["GCATCGATGAARAAYGCAGC", "-i", input_fp, "--mismatches", "2"]
+
+    output_fp = str(tmp_path / "out.fastq")
+    log_fp = str(tmp_path / "out.log")
+    main(args + ["-o", output_fp, "--log", log_fp])
+
+    other_output_fp = str(tmp_path / "other.fastq")
+    other_log_fp = str(tmp_path / "other.log")
+    main(args + ["-o", other_output_fp, "--log", other_log_fp] + extra_args)
+
+    assert read_from(other_log_fp) == read_from(log_fp)
+    assert read_from(other_output_fp) == read_from(output_fp)
+
+
+def test_main_script_gzip(tmp_path):
+    input_fp = tmp_path / "example.fastq.gz"
+    input_fp.write_bytes(gzip.compress((DATA_DIR / "example.fastq").read_bytes()))
+    args = ["GCATCGATGAAGAACGCAGC", "--min-partial", "10"]
+
+    output_fp = str(tmp_path / "out.fastq")
+    main(args + ["-i", str(DATA_DIR / "example.fastq"), "-o", output_fp])
+
+    gzip_output_fp = str(tmp_path / "out.fastq.gz")
+    main(args + ["-i", str(input_fp), "-o", gzip_output_fp, "--compress-threads", "2"])
+
+    with gzip.open(gzip_output_fp, "rt") as f:
+        assert f.readlines() == read_from(output_fp)
+
+
+def test_main_script_cache(tmp_path):
+    input_fp = str(DATA_DIR / "example.fastq")
+    cache_dir = tmp_path / "cache"
+    args = ["GCATCGATGAAGAACGCAGC", "-i", input_fp, "--cache-dir", str(cache_dir)]
+
+    output_fp = str(tmp_path / "out.fastq")
+    main(args + ["-o", output_fp])
+    assert len(list(cache_dir.iterdir())) == 1
+
+    cached_output_fp = str(tmp_path / "cached.fastq")
+    main(args + ["-o", cached_output_fp])
+    assert len(list(cache_dir.iterdir())) == 1
+    assert read_from(cached_output_fp) == read_from(output_fp)
+
+
+def test_main_script_paired(tmp_path):
+    input_fp = str(DATA_DIR / "example.fastq")
+    args = ["GCATCGATGAAGAACGCAGC", "--min-partial", "10", "--min-length", "100"]
+
+    output_fp = str(tmp_path / "out.fastq")
+    main(args + ["-i", input_fp, "-o", output_fp])
+
+    # R2 primer is not found, so R1 determines which pairs are written
+    output_r1_fp = str(tmp_path / "out_R1.fastq")
+    output_r2_fp = str(tmp_path / "out_R2.fastq")
+    log_r2_fp = str(tmp_path / "out_R2.log")
+    main(
+        args
+        + ["-i", input_fp, "--input-fastq-r2", input_fp]
+        + ["-o", output_r1_fp, "--output-fastq-r2", output_r2_fp]
+        + ["--log-r2", log_r2_fp, "--reverse-primer", "CATGCATGCATGCATGCATG"]
+    )
+    assert read_from(output_r1_fp) == read_from(output_fp)
+    output_r2_ids = read_from(output_r2_fp)[::4]
+    output_ids = read_from(output_fp)[::4]
+    assert output_r2_ids == output_ids
+    assert all("No match" in line for line in read_from(log_r2_fp)[1:])
+
+
+def test_main_script_stats(tmp_path):
+    input_fp = str(DATA_DIR / "example.fastq")
+    output_fp = str(tmp_path / "out.fastq")
+    log_fp = str(tmp_path / "out.log")
+    stats_fp = str(tmp_path / "stats.json")
+    profile_fp = str(tmp_path / "out.prof")
+    main(
+        ["GCATCGATGAAGAACGCAGC", "-i", input_fp, "-o", output_fp, "--log", log_fp]
+        + ["--stats", stats_fp, "--profile", profile_fp]
+    )
+
+    with open(stats_fp) as f:
+        stats = json.load(f)
+    num_reads = len(read_from(log_fp)) - 1
+    assert stats["stages"]["parse"]["reads_out"] == num_reads
+    assert stats["stages"]["complete"]["reads_in"] == num_reads
+    assert stats["stages"]["write"]["reads_out"] == len(read_from(output_fp)) // 4
+    assert sum(stats["match_counts"].values()) == num_reads
+    assert pstats.Stats(profile_fp).total_calls > 0
+
+
+def test_main_script_log_formats(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    input_fp = str(DATA_DIR / "example.fastq")
+    args = ["GCATCGATGAAGAACGCAGC", "-i", input_fp, "-o", str(tmp_path / "out.fastq")]
+
+    log_fp = str(tmp_path / "out.log")
+    main(args + ["--log", log_fp])
+    parquet_fp = str(tmp_path / "out.parquet")
+    summary_fp = str(tmp_path / "summary.json")
+    main(args + ["--log", parquet_fp, "--log-summary", summary_fp])
+
+    log_lines = read_from(log_fp)[1:]
+    parquet_lines = [
+        "\t".join("" if v is None else str(v) for v in row.values()) + "\n"
+        for row in pq.read_table(parquet_fp).to_pylist()
+    ]
+    assert parquet_lines == log_lines
+
+    with open(summary_fp) as f:
+        summary = json.load(f)
+    assert summary["reads"] == len(log_lines)
+    assert summary["match_counts"]["No match"] == sum(
+        "\tNo match\t" in line for line in log_lines
+    )
+
+
+def test_main_script_search_window(tmp_path):
+    input_fp = str(DATA_DIR / "example.fastq")
+    log_fp = str(tmp_path / "out.log")
+    main(
+        ["GCATCGATGAAGAACGCAGC", "-i", input_fp, "-o", str(tmp_path / "out.fastq")]
+        + ["--log", log_fp, "--search-last", "60", "--min-partial", "100"]
+    )
+    starts = [
+        int(line.split("\t")[2])
+        for line in read_from(log_fp)[1:]
+        if "\tComplete\t" in line
+    ]
+    assert starts
+    # Reads are 251 bases long
+    assert min(starts) >= 251 - 60
+
+
+def test_main_script_stop_at_short_match_window(tmp_path):
+    primer = "GCATCGATGAAGAACGCAGC"
+    seq = "T" * 110 + "A" + primer[1:] + "T" * 30 + primer + "T" * 20
+    input_fp = tmp_path / "in.fastq"
+    input_fp.write_text("@a\n" + seq + "\n+\n" + "I" * len(seq) + "\n")
+    log_fp = str(tmp_path / "out.log")
+    main(
+        [primer, "-i", str(input_fp), "-o", str(tmp_path / "out.fastq")]
+        + ["--log", log_fp, "--search-start", "100", "--min-length", "50"]
+        + ["--stop-at-short-match"]
+    )
+    # Matches in the window are past the minimum length, so the best
+    # match is found as usual
+    assert read_from(log_fp)[1] == "a\tComplete\t160\t0\t{}\n".format(primer)
+
+
+@pytest.mark.parametrize("option", ["--search-start", "--search-end", "--search-last"])
+def test_main_script_negative_search_window(option):
+    with pytest.raises(SystemExit):
+        main(["GCATCGATGAAGAACGCAGC", option, "-5"])
+
+
+def test_main_script_stop_at_short_match_search_last(tmp_path):
+    with pytest.raises(SystemExit):
+        main(["GCATCGATGAAGAACGCAGC", "--search-last", "60", "--stop-at-short-match"])
+
+
+def test_main_script_too_short(tmp_path):
+    input_fp = tmp_path / "in.fastq"
+    input_fp.write_text(
+        "@a\nGCATCGATGAAGAACGCAGCTT\n+\nIIIIIIIIIIIIIIIIIIIIII\n"
+        "@b\n" + "A" * 60 + "\n+\n" + "I" * 60 + "\n"
+    )
+    output_fp = str(tmp_path / "out.fastq")
+    log_fp = str(tmp_path / "out.log")
+    main(
+        ["GCATCGATGAAGAACGCAGC", "-i", str(input_fp), "-o", output_fp]
+        + ["--log", log_fp, "--min-length", "50"]
+    )
+    assert read_from(log_fp)[1:] == ["a\tToo short\t22\t\t\n", "b\tNo match\t60\t\t\n"]
+    assert read_from(output_fp)[0] == "@b\n"
+
+
+def test_main_script_pipeline_paired(tmp_path):
+    input_fp = str(DATA_DIR / "example.fastq")
+    args = ["GCATCGATGAAGAACGCAGC", "--mismatches", "2", "--chunk-size", "100"]
+
+    output_fp = str(tmp_path / "out.fastq")
+    main(args + ["-i", input_fp, "-o", output_fp])
+
+    output_r2_fp = str(tmp_path / "out_R2.fastq")
+    main(
+        args
+        + ["-i", input_fp, "--input-fastq-r2", input_fp, "--pipeline"]
+        + ["-o", str(tmp_path / "out_R1.fastq"), "--output-fastq-r2", output_r2_fp]
+    )
+    assert read_from(output_r2_fp) == read_from(output_fp)
+
+
+def test_main_script_records_and_shards(tmp_path):
+    input_fp = tmp_path / "example.fastq"
+    input_fp.write_bytes((DATA_DIR / "example.fastq").read_bytes())
+    args = ["GCATCGATGAAGAACGCAGC", "-i", str(input_fp), "--min-length", "0"]
+
+    output_fp = str(tmp_path / "out.fastq")
+    log_fp = str(tmp_path / "out.log")
+    main(args + ["-o", output_fp, "--log", log_fp])
+
+    records_fp = str(tmp_path / "records.fastq")
+    main(args + ["-o", records_fp, "--records", "101-200"])
+    assert read_from(records_fp) == read_from(output_fp)[400:800]
+
+    # Index lets us skip to the first record
+    index_main([str(input_fp), "--interval", "30"])
+    main(args + ["-o", records_fp, "--records", "101-200"])
+    assert read_from(records_fp) == read_from(output_fp)[400:800]
+
+    shard_lines = []
+    shard_log_lines = []
+    for shard in ["1/3", "2/3", "3/3"]:
+        shard_fp = str(tmp_path / "shard.fastq")
+        shard_log_fp = str(tmp_path / "shard.log")
+        main(args + ["-o", shard_fp, "--log", shard_log_fp, "--shard", shard])
+        shard_lines += read_from(shard_fp)
+        shard_log_lines += read_from(shard_log_fp)[1:]
+    assert shard_lines == read_from(output_fp)
+    assert shard_log_lines == read_from(log_fp)[1:]
+
+
+def test_main_script_checkpoint(tmp_path, monkeypatch):
+    input_fp = str(DATA_DIR / "example.fastq")
+    args = ["GCATCGATGAAGAACGCAGC", "-i", input_fp, "--chunk-size", "1000"]
+
+    output_fp = str(tmp_path / "out.fastq.gz")
+    log_fp = str(tmp_path / "out.log")
+    summary_fp = str(tmp_path / "summary.json")
+    main(args + ["-o", output_fp, "--log", log_fp, "--log-summary", summary_fp])
+
+    # Stop the run after the second checkpoint, with the third chunk
+    # partly written
+    def stop_run(*args):
+        nonlocal num_checkpoints
+        num_checkpoints += 1
+        if num_checkpoints > 2:
+            raise KeyboardInterrupt()
+        write_checkpoint(*args)
+
+    num_checkpoints = 0
+    monkeypatch.setattr("primertrim.command.write_checkpoint", stop_run)
+    checkpoint_fp = str(tmp_path / "checkpoint.json")
+    resumed_output_fp = str(tmp_path / "resumed.fastq.gz")
+    resumed_log_fp = str(tmp_path / "resumed.log")
+    resumed_summary_fp = str(tmp_path / "resumed_summary.json")
+    resumed_args = args + [
+        "-o",
+        resumed_output_fp,
+        "--log",
+        resumed_log_fp,
+        "--log-summary",
+        resumed_summary_fp,
+        "--checkpoint",
+        checkpoint_fp,
+    ]
+    with pytest.raises(KeyboardInterrupt):
+        main(resumed_args)
+    with open(checkpoint_fp) as f:
+        assert json.load(f)["records_done"] == 2000
+
+    # The checkpoint belongs to a run with a different primer
+    with pytest.raises(ValueError):
+        main(["ACGTACGTACGTACGTACGT"] + resumed_args[1:])
+
+    monkeypatch.undo()
+    main(resumed_args)
+    with gzip.open(resumed_output_fp, "rt") as f:
+        with gzip.open(output_fp, "rt") as expected_f:
+            assert f.readlines() == expected_f.readlines()
+    assert read_from(resumed_log_fp) == read_from(log_fp)
+    with open(resumed_summary_fp) as f:
+        with open(summary_fp) as expected_f:
+            assert json.load(f) == json.load(expected_f)
+    # The checkpoint is removed when the run is finished
+    assert not os.path.exists(checkpoint_fp)
+
+
+def test_main_script_quality(tmp_path):
+    input_fp = tmp_path / "in.fastq"
+    input_fp.write_text(
+        "@a\nACGTACGTACGTGCATCGATGAAGAACGCAGC\n+\n" + "I" * 32 + "\n"
+        "@b\nACGTACGTACGTACGT\n+\nIIIIIIIIIIII####\n"
+        "@c\nACGTNNNTACGTACGT\n+\nIIIIIIIIIIIIIIII\n"
+    )
+    output_fp = str(tmp_path / "out.fastq")
+    log_fp = str(tmp_path / "out.log")
+    main(
+        ["GCATCGATGAAGAACGCAGC", "-i", str(input_fp), "-o", output_fp]
+        + ["--log", log_fp, "--min-length", "10", "--quality-cutoff", "20"]
+        + ["--max-n", "2"]
+    )
+    assert read_from(output_fp) == [
+        "@a\n",
+        "ACGTACGTACGT\n",
+        "+\n",
+        "IIIIIIIIIIII\n",
+        "@b\n",
+        "ACGTACGTACGT\n",
+        "+\n",
+        "IIIIIIIIIIII\n",
+    ]
+    assert [line.split("\t")[:3] for line in read_from(log_fp)[1:]] == [
+        ["a", "Complete", "12"],
+        ["b", "No match", "12"],
+        ["c", "No match", "16"],
+    ]
@@ -0,0 +1,68 @@
+import gzip
+import os
+import struct
+
+import pytest
+
+from primertrim.compression import (
+    BGZF_EOF,
+    ParallelGzipWriter,
+    compression_from_filename,
+    open_input,
+    open_output,
+)
+
+DATA = b"".join(b"@read%d\nACGTACGT\n+\nFFFFFFFF\n" % n for n in range(1000))
+
+
+def test_compression_from_filename():
+    assert compression_from_filename("a.fastq.gz") == "gzip"
+    assert compression_from_filename("a.fastq.bgz") == "bgzf"
+    assert compression_from_filename("a.fastq.zst") == "zstd"
+    assert compression_from_filename("a.fastq") == "none"
+
+
+def test_parallel_gzip_writer(tmp_path):
+    fp = tmp_path / "out.gz"
+    with ParallelGzipWriter(open(fp, "wb"), threads=3, block_size=1000) as f:
+        f.write(DATA[:5000])
+        f.write(DATA[5000:])
+    assert gzip.decompress(fp.read_bytes()) == DATA
+
+
+def test_bgzf_blocks(tmp_path):
+    data = os.urandom(100000) + DATA
+    fp = tmp_path / "out.bgz"
+    with ParallelGzipWriter(open(fp, "wb"), threads=2, bgzf=True) as f:
+        f.write(data)
+    compressed = fp.read_bytes()
+    assert gzip.decompress(compressed) == data
+    assert compressed.endswith(BGZF_EOF)
+    # Each block has a BC extra field with the size of the block
+    pos = 0
+    while pos < len(compressed):
+        assert compressed[pos + 12 : pos + 16] == b"BC\x02\x00"
+        (bsize,) = struct.unpack("<H", compressed[pos + 16 : pos + 18])
+        pos += bsize + 1
+    assert pos == len(compressed)
+
+
+@pytest.mark.parametrize(
+    "filename", ["out.fastq", "out.fastq.gz", "out.fastq.bgz", "out.fastq.zst"]
+)
+def test_roundtrip(tmp_path, filename):
+    if filename.endswith(".zst"):
+        pytest.importorskip("zstandard")
+    fp = str(tmp_path / filename)
+    with open_output(fp, threads=2) as f:
+        f.write(DATA)
+    with open_input(fp) as f:
+        assert f.read() == DATA
+
+
+def test_open_input_detects_gzip(tmp_path):
+    # Compression is detected from the file contents, not the extension
+    fp = tmp_path / "out.fastq"
+    fp.write_bytes(gzip.compress(DATA))
+    with open_input(str(fp)) as f:
+        assert f.read() == DATA
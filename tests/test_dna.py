@@ -1,6 +1,9 @@
 from primertrim.dna import (
+    deambiguate,
     partial_seqs_left,
     partial_seqs_right,
+    reverse_complement,
+    split_segments,
 )
 
 
@@ -15,3 +18,13 @@ def test_partial_seqs_right():
 def test_partial_no_results():
     assert list(partial_seqs_left("ABCDE", 5)) == []
     assert list(partial_seqs_right("ABCDE", 5)) == []
+
+
+def test_split_segments():
+    assert list(split_segments("ABCDEFG", 3)) == [(0, "AB"), (2, "CD"), (4, "EFG")]
+
+
+def test_reverse_complement_ambiguous():
+    assert reverse_complement("ACRYN") == "NRYGT"
+    rc_variants = [reverse_complement(v) for v in deambiguate("ACRYN")]
+    assert sorted(rc_variants) == sorted(deambiguate("NRYGT"))
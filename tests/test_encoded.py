@@ -0,0 +1,41 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from primertrim.encoded import EncodedReads, VectorizedCompleteMatcher, encode_seq
+from primertrim.matcher import CompleteMatcher
+
+SEQS = [
+    ("a", "TTTACGTACGTACGTTT"),
+    ("b", "TTTACGTACCTACGTTT"),
+    ("c", "TTTACGTANCTACGTTT"),
+    ("d", "ACGTAC"),
+    ("e", "GGGGGGGGACGTACG"),
+    ("f", "CGTACGTGGGGGGGG"),
+    ("g", ""),
+]
+
+
+def test_encoded_reads_windows():
+    reads = EncodedReads(["ACGT", "GN"])
+    assert reads.offsets.tolist() == [0, 4, 6]
+    assert reads.windows(3).tolist() == [[0, 1, 2], [2, 4, 5]]
+    assert reads.windows(3, from_end=True).tolist() == [[1, 2, 3], [5, 2, 4]]
+
+
+def test_encoded_reads_find_near_matches():
+    reads = EncodedReads(["TTACG", "ACGAT", "ACCT"])
+    read_idxs, starts, counts = reads.find_near_matches(encode_seq("ACG"), 1)
+    # Placements spanning two reads are not reported
+    assert read_idxs.tolist() == [0, 1, 2]
+    assert starts.tolist() == [2, 0, 0]
+    assert counts.tolist() == [0, 0, 1]
+
+
+def test_vectorized_complete_matcher():
+    queries = ["ACGTACGTACGT", "TACCTAC"]
+    for max_mismatch in range(3):
+        for discard_before in [None, 4]:
+            m = CompleteMatcher(queries, max_mismatch, True, discard_before)
+            vm = VectorizedCompleteMatcher(queries, max_mismatch, True, discard_before)
+            assert list(vm.find_in_seqs(SEQS)) == list(m.find_in_seqs(SEQS))
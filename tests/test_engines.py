@@ -0,0 +1,34 @@
+import pytest
+
+from primertrim import engines
+from primertrim.engines import build_matchers, deambiguate_primers
+from primertrim.matcher import PartialMatcher
+
+
+def test_deambiguate_primers():
+    assert deambiguate_primers(["ACR", "GT"]) == ["ACA", "ACG", "GT"]
+
+
+def test_build_matchers():
+    matchers = build_matchers(["ACGTACGTAC"], 1, 8, True)
+    assert [m.stage for m in matchers] == ["complete", "partial"]
+
+
+def test_build_matchers_numpy():
+    pytest.importorskip("numpy")
+    complete_matcher, partial_matcher = build_matchers(
+        ["ACGTACGTAC"], 1, 8, True, "numpy"
+    )
+    assert type(complete_matcher).__name__ == "VectorizedCompleteMatcher"
+    # Partial matches are always found with the prefix trie
+    assert type(partial_matcher) is PartialMatcher
+
+
+def test_build_matchers_bitparallel_not_expanded(monkeypatch):
+    # Degenerate primers are only expanded for the other engines
+    def fail(primers):
+        raise AssertionError("Primers were expanded")
+
+    monkeypatch.setattr(engines, "deambiguate_primers", fail)
+    matchers = build_matchers(["GCATCG" + "N" * 12 + "CAGC"], 1, 8, True, "bitparallel")
+    assert [m.stage for m in matchers] == ["complete", "partial"]
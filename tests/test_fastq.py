@@ -0,0 +1,65 @@
+import io
+
+import pytest
+
+from primertrim.fastq import FastqFormatError, parse_fastq, write_fastq
+
+FASTQ = "@a 1\nACGT\n+\nIIII\n@b\nGG\n+b\nFF\n@c\n\n+\n\n"
+READS = [("a 1", "ACGT", "IIII"), ("b", "GG", "FF"), ("c", "", "")]
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 1024])
+def test_parse_fastq(batch_size):
+    assert list(parse_fastq(io.StringIO(FASTQ), batch_size)) == READS
+    f = io.BytesIO(FASTQ.encode("utf-8"))
+    assert list(parse_fastq(f, batch_size)) == READS
+    # The binary file is left open
+    assert not f.closed
+
+
+def test_parse_fastq_line_endings():
+    f = io.BytesIO(FASTQ.replace("\n", "\r\n").encode("utf-8"))
+    assert list(parse_fastq(f)) == READS
+    # No newline at the end of the file, and blank lines after
+    assert list(parse_fastq(io.StringIO("@a\nAC\n+\nII"))) == [("a", "AC", "II")]
+    assert list(parse_fastq(io.StringIO(FASTQ + "\n\n"))) == READS
+    assert list(parse_fastq(io.StringIO(""))) == []
+
+
+def test_parse_fastq_trailing_whitespace():
+    f = io.StringIO("@a 1 \nACGT \n+\nIIII\t\n@b\nGG\n+\nFF  ")
+    assert list(parse_fastq(f, 1)) == [("a 1", "ACGT", "IIII"), ("b", "GG", "FF")]
+
+
+def test_parse_fastq_missing_plus():
+    f = io.StringIO("@a\nACGT\n+\nIIII\n@b\nGG\nFF\n@c\nA\n+\nI\n")
+    with pytest.raises(FastqFormatError, match="record 2 .*missing \\+"):
+        list(parse_fastq(f))
+
+
+def test_parse_fastq_length_mismatch():
+    f = io.StringIO("@a\nACGT\n+\nIII\n")
+    with pytest.raises(FastqFormatError, match="record 1 \\(@a\\).*lengths"):
+        list(parse_fastq(f))
+
+
+def test_parse_fastq_bad_description():
+    f = io.StringIO("@a\nACGT\n+\nIIII\na\nACGT\n+\nIIII\n")
+    with pytest.raises(FastqFormatError, match="record 2"):
+        list(parse_fastq(f))
+
+
+def test_parse_fastq_truncated():
+    f = io.StringIO("@a\nACGT\n+\nIIII\n@b\nACGT\n")
+    with pytest.raises(FastqFormatError, match="Incomplete"):
+        list(parse_fastq(f))
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 10])
+def test_write_fastq(batch_size):
+    f = io.StringIO()
+    assert write_fastq(f, READS, batch_size) == 3
+    assert f.getvalue() == "@a 1\nACGT\n+\nIIII\n@b\nGG\n+\nFF\n@c\n\n+\n\n"
+    f = io.StringIO()
+    assert write_fastq(f, []) == 0
+    assert f.getvalue() == ""
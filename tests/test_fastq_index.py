@@ -0,0 +1,82 @@
+import argparse
+import gzip
+import io
+
+import pytest
+
+from primertrim.fastq_index import (
+    FastqIndex,
+    load_index,
+    main,
+    parse_fastq_range,
+    parse_record_range,
+    parse_shard,
+    shard_range,
+)
+
+FASTQ = b"".join(
+    b"@read%d\nACGT\n+\nIIII\n" % n if n != 5 else b"@read5\nACGTACGT\n+\nIIIIIIII\n"
+    for n in range(10)
+)
+
+
+def test_build_index():
+    index = FastqIndex.build(io.BytesIO(FASTQ + b"\n\n"), 4)
+    assert index.num_records == 10
+    assert index.offsets == [0, 76, 160]
+    assert index.seek_record(9) == (8, 160)
+    assert index.seek_record(3) == (0, 0)
+
+
+def test_build_index_empty():
+    index = FastqIndex.build(io.BytesIO(b""), 4)
+    assert index.num_records == 0
+    assert index.offsets == []
+    assert index.seek_record(5) == (0, 0)
+
+
+def test_parse_fastq_range():
+    index = FastqIndex.build(io.BytesIO(FASTQ), 3)
+    expected = ["read%d" % n for n in range(4, 9)]
+    for idx in [None, index]:
+        reads = parse_fastq_range(io.BytesIO(FASTQ), 4, 9, idx)
+        assert [desc for desc, _, _ in reads] == expected
+    # Files that can't seek are read up to the indexed record
+    f = gzip.GzipFile(fileobj=io.BytesIO(gzip.compress(FASTQ)))
+    reads = parse_fastq_range(f, 8, None, index)
+    assert [desc for desc, _, _ in reads] == ["read8", "read9"]
+
+
+def test_index_main(tmp_path):
+    fastq_fp = tmp_path / "a.fastq.gz"
+    fastq_fp.write_bytes(gzip.compress(FASTQ))
+    main([str(fastq_fp), "--interval", "3"])
+    index = load_index(str(fastq_fp))
+    assert index.num_records == 10
+    assert index.offsets == [0, 57, 122, 179]
+
+    # Index is out of date if the file changes
+    fastq_fp.write_bytes(FASTQ)
+    with pytest.raises(ValueError):
+        load_index(str(fastq_fp))
+
+
+def test_parse_record_range():
+    assert parse_record_range("11-20") == (10, 20)
+    assert parse_record_range("11-") == (10, None)
+    assert parse_record_range("-20") == (0, 20)
+    for text in ["20", "20-11", "0-5", "a-b"]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_record_range(text)
+
+
+def test_parse_shard():
+    assert parse_shard("2/3") == (2, 3)
+    for text in ["0/3", "4/3", "2", "a/b"]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_shard(text)
+
+
+def test_shard_range():
+    ranges = [shard_range(k, 3, 10) for k in [1, 2, 3]]
+    assert ranges == [(0, 3), (3, 6), (6, 10)]
@@ -0,0 +1,65 @@
+import gzip
+import io
+
+import pytest
+
+from primertrim.logfile import LogSummary, log_format_from_filename, open_log_writer
+
+LOGINFO = [
+    ("a", "Complete", 10, 0, "ACGT"),
+    ("b", "No match", 100, None, None),
+    ("c", "Partial", 40, 0, "ACG"),
+    ("d", "Complete", 12, 1, "ACGT"),
+]
+
+
+def test_log_format_from_filename():
+    assert log_format_from_filename("a.log") == "tsv"
+    assert log_format_from_filename("a.log.gz") == "tsv"
+    assert log_format_from_filename("a.PARQUET") == "parquet"
+
+
+def test_tsv_log_writer(tmp_path):
+    log_fp = tmp_path / "a.log.gz"
+    writer = open_log_writer(str(log_fp))
+    writer.write(LOGINFO[:2])
+    writer.write(LOGINFO[2:])
+    writer.close()
+    with gzip.open(log_fp, "rt") as f:
+        lines = f.readlines()
+    assert lines[0].startswith("read_id\tmatch_type")
+    assert lines[1:3] == ["a\tComplete\t10\t0\tACGT\n", "b\tNo match\t100\t\t\n"]
+    assert len(lines) == 5
+
+
+def test_parquet_log_writer(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    log_fp = tmp_path / "a.parquet"
+    writer = open_log_writer(str(log_fp))
+    writer.write(LOGINFO[:2])
+    writer.write([])
+    writer.write(LOGINFO[2:])
+    writer.close()
+    table = pq.read_table(log_fp)
+    assert table.num_rows == 4
+    assert [tuple(row.values()) for row in table.to_pylist()] == LOGINFO
+    assert str(table.schema.field("match_type").type).startswith("dictionary")
+
+
+def test_log_summary():
+    summary = LogSummary()
+    summary.update(LOGINFO)
+    f = io.StringIO()
+    summary.write(f)
+    assert summary.to_dict() == {
+        "reads": 4,
+        "match_counts": {"Complete": 2, "No match": 1, "Partial": 1},
+        "mismatch_counts": {"0": 2, "1": 1},
+        "primer_counts": {"ACGT": 2, "ACG": 1},
+    }
+
+
+def test_log_summary_update_iter():
+    summary = LogSummary()
+    assert list(summary.update_iter(iter(LOGINFO))) == LOGINFO
+    assert summary.num_reads == 4
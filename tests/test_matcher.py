@@ -1,12 +1,18 @@
 from primertrim.matcher import (
+    AdaptiveCompleteMatcher,
     PrimerMatch,
     CompleteMatcher,
     PartialMatcher,
     AlignmentMatcher,
+    MemoizedMatcher,
+    ShortReadMatcher,
+    WindowedMatcher,
 )
 
 import os
 
+import pytest
+
 
 def test_complete_match():
     m = CompleteMatcher(["TTTTTT"], 1, False)
@@ -15,6 +21,62 @@ def test_complete_match():
     assert m.find_match("AATTGGTT") == None  # Two mismatches is too much
 
 
+def test_complete_match_many_mismatches():
+    m = CompleteMatcher(["GCATCGATGAAGAACGCAGC"], 4, False)
+    read = "TTTGCATCCATGTAGTACGGAGCTTT"
+    assert m.find_match(read) == PrimerMatch("Complete", 3, 4, "GCATCCATGTAGTACGGAGC")
+    m = CompleteMatcher(["GCATCGATGAAGAACGCAGC"], 3, False)
+    assert m.find_match(read) == None
+
+
+def test_complete_match_fewest_mismatches():
+    m = CompleteMatcher(["TTTTTT"], 2, False)
+    # Match with fewer mismatches is preferred to the leftmost match
+    assert m.find_match("ATTGTTTGGATTTTTT") == PrimerMatch("Complete", 10, 0, "TTTTTT")
+    # Queries are tried in order, with the reverse complement last
+    m = CompleteMatcher(["GGGAAA"], 1, True)
+    assert m.find_match("TTTCCCAAGGGAAA") == PrimerMatch("Complete", 8, 0, "GGGAAA")
+    assert m.find_match("TTTCCCAAGGGTAA") == PrimerMatch("Complete", 0, 0, "TTTCCC")
+
+
+def test_complete_match_discard_before():
+    seq = "AAATTGTTTAAAAAAAAAAAATTTTTTAA"
+    m = CompleteMatcher(["TTTTTT"], 1, False)
+    assert m.find_match(seq) == PrimerMatch("Complete", 21, 0, "TTTTTT")
+    # A worse match near the start is reported, because the read
+    # would be discarded anyway
+    m = CompleteMatcher(["TTTTTT"], 1, False, discard_before=10)
+    assert m.find_match(seq) == PrimerMatch("Complete", 3, 1, "TTGTTT")
+    m = CompleteMatcher(["TTTTTT"], 1, False, discard_before=2)
+    assert m.find_match(seq) == PrimerMatch("Complete", 21, 0, "TTTTTT")
+
+
+def test_adaptive_complete_match():
+    queries = ["ACGTACGT", "TTGGCCAA"]
+    m = AdaptiveCompleteMatcher(queries, 1, False, update_interval=2)
+    assert m.find_match("GGTTGGCCAAGG") == PrimerMatch("Complete", 2, 0, "TTGGCCAA")
+    assert m.find_match("TTGGCCAAGG") == PrimerMatch("Complete", 0, 0, "TTGGCCAA")
+    assert m.frequent_queries == [1]
+    # Frequent query is found first, but an earlier query still wins
+    seq = "TTGGCCAAGACGTACGT"
+    assert m.find_match(seq) == PrimerMatch("Complete", 9, 0, "ACGTACGT")
+    assert m.find_match("TTGGCAAAG") == PrimerMatch("Complete", 0, 1, "TTGGCAAA")
+
+
+def test_adaptive_complete_match_discard_before():
+    seq = "AAATTGTTTAAAAAAAAAAAATTTTTTAA"
+    m = AdaptiveCompleteMatcher(["TTTTTT"], 1, False, 10, update_interval=1)
+    m.frequent_queries = [0]
+    assert m.find_match(seq) == PrimerMatch("Complete", 3, 1, "TTGTTT")
+    assert m.find_match("TTTTTT" + seq) == PrimerMatch("Complete", 0, 0, "TTTTTT")
+
+
+def test_short_read_match():
+    m = ShortReadMatcher(5)
+    assert m.find_match("ACGT") == PrimerMatch("Too short", 4, None, None)
+    assert m.find_match("ACGTA") is None
+
+
 def test_partial_match():
     m = PartialMatcher(["AAAAAA"], 4, False)
     assert m.find_match("AAAAAGTCGT") == PrimerMatch("Partial", 0, 0, "AAAAA")
@@ -44,3 +106,83 @@ def test_align_match(tmp_path):
     for item in m_gen:
         assert item[1] == p_match[i]
         i += 1
+
+
+def test_align_match_builtin():
+    pytest.importorskip("numpy")
+    m = AlignmentMatcher(["GGGGGAAAAACCCCCTTTTT"], None, 0.8, backend="builtin")
+    seqs = [("test", "GGGGGAACAA"), ("test2", "ACGTACGTACGT")]
+    assert list(m.find_in_seqs(seqs)) == [
+        ("test", PrimerMatch("Alignment", 0, 1, "GGGGGAACAA")),
+    ]
+
+
+class CountingMatcher(CompleteMatcher):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.searched = []
+
+    def find_match(self, seq):
+        self.searched.append(seq)
+        return super().find_match(seq)
+
+
+def test_memoized_match():
+    m = CountingMatcher(["TTTTTT"], 1, False)
+    mm = MemoizedMatcher(m, 2)
+    seqs = [("a", "AGATTTTTT"), ("b", "CCCC"), ("c", "AGATTTTTT")]
+    assert list(mm.find_in_seqs(seqs)) == [
+        ("a", PrimerMatch("Complete", 3, 0, "TTTTTT")),
+        ("b", None),
+        ("c", PrimerMatch("Complete", 3, 0, "TTTTTT")),
+    ]
+    assert m.searched == ["AGATTTTTT", "CCCC"]
+
+    # Only the two most recently seen sequences are remembered
+    list(mm.find_in_seqs([("d", "GGGG"), ("e", "CCCC")]))
+    list(mm.find_in_seqs([("f", "AGATTTTTT"), ("g", "CCCC")]))
+    assert m.searched == ["AGATTTTTT", "CCCC", "GGGG", "AGATTTTTT"]
+
+
+def test_memoized_align_match_builtin():
+    pytest.importorskip("numpy")
+    # The alignment matcher reports only reads with a match
+    m = AlignmentMatcher(["ACGTACGTACGTACGT"], None, 0.8, backend="builtin")
+    mm = MemoizedMatcher(m, 10)
+    seqs = [
+        ("a", "TTTACGTACGTACGTACGTT"),
+        ("b", "G" * 20),
+        ("c", "TTTACGTACGTACGTACGTT"),
+    ]
+    res = dict(mm.find_in_seqs(seqs))
+    assert res["b"] is None
+    assert res["a"] == res["c"] == PrimerMatch("Alignment", 3, 0, "ACGTACGTACGTACGT")
+
+
+def test_windowed_match():
+    m = CountingMatcher(["TTTTTT"], 0, False)
+    seqs = [("a", "TTTTTTAAAAAAAAAA"), ("b", "AAAAAAAAAATTTTTT"), ("c", "TTTT")]
+
+    wm = WindowedMatcher(m, last=8)
+    assert list(wm.find_in_seqs(seqs)) == [
+        ("a", None),
+        ("b", PrimerMatch("Complete", 10, 0, "TTTTTT")),
+        ("c", None),
+    ]
+    assert m.searched == ["AAAAAAAA", "AATTTTTT", "TTTT"]
+
+    wm = WindowedMatcher(m, start=1, end=12)
+    assert list(wm.find_in_seqs(seqs)) == [("a", None), ("b", None), ("c", None)]
+
+    wm = WindowedMatcher(m, end=6)
+    assert list(wm.find_in_seqs(seqs))[0] == (
+        "a",
+        PrimerMatch("Complete", 0, 0, "TTTTTT"),
+    )
+
+
+def test_windowed_match_empty_window():
+    m = CountingMatcher(["TTTTTT"], 0, False)
+    wm = WindowedMatcher(m, start=20)
+    assert list(wm.find_in_seqs([("a", "TTTTTT")])) == [("a", None)]
+    assert m.searched == []
@@ -0,0 +1,34 @@
+from primertrim.matcher import CompleteMatcher
+from primertrim.parallel import match_chunks
+
+read1 = ("seq1", "ATGTCATGACTTGACTGCGG", "FFFFFFFFFFFFFFFFFFFF")
+read2 = ("seq2", "AGTCACGCTGACTGCATTGA", "FFFFFFFFFFFFFFFFFFFF")
+read3 = ("seq3", "TACGTCATGCATCGTAGTAA", "FFFFFFFFFFFFFFFFFFFF")
+
+chunks = [[read1, read2], [read3], [read2, read3]]
+matchers = [CompleteMatcher(["ACTGCATTGA"], 1, False)]
+
+
+def get_loginfo(trimmable_reads_list):
+    return [list(t.output_loginfo()) for t in trimmable_reads_list]
+
+
+def test_match_chunks():
+    res = get_loginfo(match_chunks(chunks, matchers))
+    assert res == [
+        [
+            ("seq1", "No match", 20, None, None),
+            ("seq2", "Complete", 10, 0, "ACTGCATTGA"),
+        ],
+        [("seq3", "No match", 20, None, None)],
+        [
+            ("seq2", "Complete", 10, 0, "ACTGCATTGA"),
+            ("seq3", "No match", 20, None, None),
+        ],
+    ]
+
+
+def test_match_chunks_parallel():
+    serial_res = get_loginfo(match_chunks(chunks, matchers, jobs=1))
+    parallel_res = get_loginfo(match_chunks(chunks, matchers, jobs=2))
+    assert parallel_res == serial_res
@@ -0,0 +1,52 @@
+import pytest
+
+from primertrim.pipeline import run_stages
+
+
+def double(items):
+    for item in items:
+        yield item * 2
+
+
+def add_one(items):
+    for item in items:
+        yield item + 1
+
+
+def fail_at_five(items):
+    for item in items:
+        if item == 5:
+            raise ValueError("five")
+        yield item
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_run_stages(threaded):
+    observed = list(run_stages(range(100), [double, add_one], threaded))
+    assert observed == [2 * n + 1 for n in range(100)]
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_run_stages_no_items(threaded):
+    assert list(run_stages([], [double, add_one], threaded)) == []
+
+
+def test_run_stages_error():
+    with pytest.raises(ValueError, match="five"):
+        list(run_stages(range(100), [fail_at_five, double], True))
+
+
+def test_run_stages_error_in_items():
+    def items():
+        yield 1
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError, match="bad input"):
+        list(run_stages(items(), [double], True))
+
+
+def test_run_stages_stop_early():
+    # Threads are shut down if the consumer stops before the end
+    items = run_stages(range(1000), [double], True, queue_size=1)
+    assert next(items) == 0
+    items.close()
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from primertrim.quality import QualityTrimmer, mott_trim_length, window_trim_length
+
+
+def phred(scores, offset=33):
+    return "".join(chr(q + offset) for q in scores)
+
+
+def test_mott_trim_length():
+    # Example from the cutadapt documentation
+    quals = phred([42, 40, 26, 27, 8, 7, 11, 4, 2, 3]).encode()
+    assert mott_trim_length(quals, 10 + 33) == 4
+    assert mott_trim_length(phred([30] * 10).encode(), 10 + 33) == 10
+    assert mott_trim_length(phred([2] * 10).encode(), 10 + 33) == 0
+    assert mott_trim_length(b"", 10 + 33) == 0
+
+
+def test_window_trim_length():
+    quals = phred([30, 30, 30, 30, 30, 10, 10, 30, 30, 30]).encode()
+    # First window with mean below 25 starts at position 3
+    assert window_trim_length(quals, 25 + 33, 4) == 3
+    assert window_trim_length(quals, 5 + 33, 4) == 10
+    # Reads shorter than the window are not trimmed
+    assert window_trim_length(phred([2, 2]).encode(), 25 + 33, 4) == 2
+
+
+def test_quality_trimmer():
+    qual = phred([42, 40, 26, 27, 8, 7, 11, 4, 2, 3])
+    assert QualityTrimmer(10).trim_length(qual) == 4
+    assert QualityTrimmer(10, phred_offset=64).trim_length(qual) == 1
+    assert QualityTrimmer(20, "window", window=2).trim_length(qual) == 3
+    with pytest.raises(ValueError):
+        QualityTrimmer(10, "other")
+
+
+@pytest.mark.parametrize("method", ["mott", "window"])
+def test_trim_lengths(method):
+    pytest.importorskip("numpy")
+    rng = random.Random(0)
+    quals = [
+        phred([rng.choice([2, 10, 20, 30, 40]) for _ in range(rng.randrange(12))])
+        for _ in range(500)
+    ]
+    # Trim some reads short first, as if a primer was removed
+    lengths = [rng.randint(0, len(qual)) for qual in quals]
+    starts = [0]
+    for qual in quals[:-1]:
+        starts.append(starts[-1] + len(qual))
+    trimmer = QualityTrimmer(20, method, window=3)
+    assert trimmer.trim_lengths("".join(quals), starts, lengths) == [
+        trimmer.trim_length(qual[:length]) for qual, length in zip(quals, lengths)
+    ]
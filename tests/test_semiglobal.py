@@ -0,0 +1,50 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from primertrim.semiglobal import SemiglobalAligner, align_primer, encode_seqs
+
+
+def test_encode_seqs():
+    reads, lengths = encode_seqs(["ACGT", "GN"])
+    assert reads.tolist() == [[0, 1, 2, 3], [2, 4, 5, 5]]
+    assert lengths.tolist() == [4, 2]
+
+
+def test_align_primer():
+    reads, lengths = encode_seqs(["TTTACGTACGTACGTTT", "TTTACGTACCGTACGTTT"])
+    identities, distances, starts, ends = align_primer("ACGTACGTACGT", reads, lengths)
+    assert distances.tolist() == [0, 1]
+    assert starts.tolist() == [3, 3]
+    assert ends.tolist() == [15, 16]
+
+
+def test_align_primer_overhang():
+    # Primer hangs off the end of the read
+    reads, lengths = encode_seqs(["TTTTTACGTACGTACG"])
+    identities, distances, starts, ends = align_primer(
+        "ACGTACGTACGTAAA", reads, lengths
+    )
+    assert distances.tolist() == [0]
+    assert starts.tolist() == [5]
+    assert ends.tolist() == [16]
+
+
+def test_search():
+    a = SemiglobalAligner(["GGGGGAAAAACCCCCTTTTT"], 0.8)
+    seqs = [
+        ("test", "GGGGGAAAAA"),
+        ("test2", "GGGGGAACAA"),
+        ("test3", "GGGGGGGAAAAA"),
+        ("test4", "GGGGGGGCAAAACCCCCTTTTT"),
+        ("test5", "ACGTACGTACGTACGTACGT"),
+        # Reverse complement
+        ("test6", "TTAAAAAGGGGGTTTTTCCCCCTT"),
+    ]
+    assert list(a.search(seqs)) == [
+        ("test", 0, 10, 0),
+        ("test2", 0, 10, 1),
+        ("test3", 2, 12, 0),
+        ("test4", 2, 22, 1),
+        ("test6", 2, 22, 0),
+    ]
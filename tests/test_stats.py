@@ -0,0 +1,43 @@
+import io
+import json
+
+from primertrim.stats import RunStats
+
+
+def test_time_stage():
+    stats = RunStats()
+    with stats.time_stage("parse") as stage_stats:
+        stage_stats["reads_in"] += 3
+    with stats.time_stage("parse") as stage_stats:
+        stage_stats["reads_in"] += 2
+    assert stats.stages["parse"]["reads_in"] == 5
+    assert stats.stages["parse"]["wall_seconds"] >= 0
+
+
+def test_timed_iter():
+    stats = RunStats()
+    assert list(stats.timed_iter("parse", range(5), block_size=2)) == list(range(5))
+    assert stats.stages["parse"]["reads_in"] == 5
+    assert stats.stages["parse"]["reads_out"] == 5
+
+
+def test_update():
+    stats = RunStats()
+    other = RunStats()
+    with other.time_stage("complete") as stage_stats:
+        stage_stats["reads_out"] += 4
+    other.match_counts["Complete"] += 4
+    stats.update(other)
+    stats.update(other)
+    assert stats.stages["complete"]["reads_out"] == 8
+    assert stats.match_counts["Complete"] == 8
+
+
+def test_write():
+    stats = RunStats()
+    stats.match_counts["No match"] += 1
+    f = io.StringIO()
+    stats.write(f)
+    res = json.loads(f.getvalue())
+    assert res["match_counts"] == {"No match": 1}
+    assert res["stages"] == {}
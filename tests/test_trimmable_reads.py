@@ -1,13 +1,21 @@
-from primertrim.trimmable_reads import TrimmableReads
-from primertrim.matcher import PrimerMatch
+import pytest
+
+from primertrim.trimmable_reads import (
+    TrimmableReads,
+    chunk_reads,
+    passes_filters,
+    zip_mates,
+)
+from primertrim.matcher import PrimerMatch, CompleteMatcher
+from primertrim.quality import QualityTrimmer
 
 read1 = ("seq1", "ATGTCATGACTTGACTGCGG", "FFFFFFFFFFFFFFFFFFFF")
 read2 = ("seq2", "AGTCACGCTGACTGCATTGA", "FFFFFFFFFFFFFFFFFFFF")
 read3 = ("seq3", "TACGTCATGCATCGTAGTAA", "FFFFFFFFFFFFFFFFFFFF")
 
-seq1 = ("seq1", "ATGTCATGACTTGACTGCGG")
-seq2 = ("seq2", "AGTCACGCTGACTGCATTGA")
-seq3 = ("seq3", "TACGTCATGCATCGTAGTAA")
+seq1 = (0, "ATGTCATGACTTGACTGCGG")
+seq2 = (1, "AGTCACGCTGACTGCATTGA")
+seq3 = (2, "TACGTCATGCATCGTAGTAA")
 
 log1 = ("seq1", "No match", 20, None, None)
 log2 = ("seq2", "No match", 20, None, None)
@@ -24,7 +32,7 @@ def test_register_match():
     assert list(t.get_unmatched_seqs()) == [seq1, seq2, seq3]
 
     m = PrimerMatch("Complete", 10, 0, "ACTGCATTGA")
-    t.register_match("seq2", m)
+    t.register_match(1, m)
 
     assert list(t.get_unmatched_seqs()) == [seq1, seq3]
 
@@ -35,16 +43,23 @@ def test_output():
     assert list(t.output_reads()) == [read1, read2, read3]
 
     m = PrimerMatch("Complete", 10, 0, "ACTGCATTGA")
-    t.register_match("seq2", m)
+    t.register_match(1, m)
 
     assert list(t.output_reads()) == [read1, read2_trim10, read3]
     assert list(t.output_loginfo()) == [log1, log2_trim10, log3]
 
 
+def test_output_buffer_pieces(monkeypatch):
+    monkeypatch.setattr("primertrim.trimmable_reads.BUFFER_PIECE_READS", 2)
+    t = TrimmableReads([read1, read2, read3])
+    assert t.get_desc(2) == "seq3"
+    assert list(t.output_reads()) == [read1, read2, read3]
+
+
 def test_output_min_length():
     t = TrimmableReads([read1, read2, read3])
     m = PrimerMatch("Complete", 10, 0, "ACTGCATTGA")
-    t.register_match("seq2", m)
+    t.register_match(1, m)
 
     # All reads written out
     assert list(t.output_reads(min_length=0)) == [read1, read2_trim10, read3]
@@ -57,7 +72,7 @@ def test_output_min_length():
 def test_output_zero_length():
     t = TrimmableReads([read1, read2, read3])
     m = PrimerMatch("Complete", 0, 0, "ACTGCATTGA")
-    t.register_match("seq2", m)
+    t.register_match(1, m)
 
     # All reads written out
     assert list(t.output_reads(min_length=0)) == [read1, read2_trim0, read3]
@@ -65,3 +80,62 @@ def test_output_zero_length():
     assert list(t.output_reads(min_length=-5)) == [read1, read2_trim0, read3]
     # Removes read2
     assert list(t.output_reads(min_length=1)) == [read1, read3]
+
+
+def test_apply_matchers():
+    t = TrimmableReads(iter([read1, read2, read3]))
+    t.apply_matchers([CompleteMatcher(["ACTGCATTGA"], 0, False)])
+
+    assert t.stats.stages["complete"]["reads_in"] == 3
+    assert t.stats.stages["complete"]["reads_out"] == 1
+    assert list(t.get_unmatched_seqs()) == [seq1, seq3]
+    assert list(t.output_loginfo()) == [log1, log2_trim10, log3]
+
+
+def test_trim_quality():
+    read3_low_quality = ("seq3", "TACGTCATGCATCGTAGTAA", "FFFFFFFFFFFFFFF#####")
+    t = TrimmableReads([read1, read2, read3_low_quality])
+    m = PrimerMatch("Complete", 10, 0, "ACTGCATTGA")
+    t.register_match(1, m)
+
+    assert t.trim_quality(QualityTrimmer(20)) == 1
+    read3_trim15 = ("seq3", "TACGTCATGCATCGT", "FFFFFFFFFFFFFFF")
+    assert list(t.output_reads()) == [read1, read2_trim10, read3_trim15]
+    log3_trim15 = ("seq3", "No match", 15, None, None)
+    assert list(t.output_loginfo()) == [log1, log2_trim10, log3_trim15]
+
+
+def test_passes_filters():
+    assert passes_filters("ACGNN", 5)
+    assert not passes_filters("ACGNN", 6)
+    assert passes_filters("ACGNN", 0, max_n=2)
+    assert not passes_filters("ACGNN", 0, max_n=1)
+
+
+def test_chunk_reads():
+    reads = [read1, read2, read3]
+    assert list(chunk_reads(reads, 2)) == [[read1, read2], [read3]]
+    assert list(chunk_reads(reads, 3)) == [[read1, read2, read3]]
+    assert list(chunk_reads([], 3)) == []
+
+
+def test_zip_mates():
+    read1_r2 = ("seq1 2:N:0", "GGGG", "FFFF")
+    read2_r2 = ("seq2", "CCCC", "FFFF")
+    assert list(zip_mates([[read1, read2], [read1_r2, read2_r2]])) == [
+        (read1, read1_r2),
+        (read2, read2_r2),
+    ]
+
+
+def test_zip_mates_old_illumina_ids():
+    r1 = ("seq1/1", "ACGT", "FFFF")
+    r2 = ("seq1/2", "ACGT", "FFFF")
+    assert list(zip_mates([[r1], [r2]])) == [(r1, r2)]
+
+
+def test_zip_mates_mismatched():
+    with pytest.raises(ValueError):
+        list(zip_mates([[read1, read2], [read2, read1]]))
+    with pytest.raises(ValueError):
+        list(zip_mates([[read1, read2], [read1]]))
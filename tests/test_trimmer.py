@@ -0,0 +1,72 @@
+import pytest
+
+from primertrim.matcher import PrimerMatch
+from primertrim.quality import QualityTrimmer
+from primertrim.trimmer import PrimerTrimmer, TrimmedRead
+
+primer = "GCATCGATGAAGAACGCAGC"
+
+reads = [
+    ("a extra", "ACGTACGTACGT" + primer + "AAA", "I" * 35),
+    ("b", "ACGTACGTACGTACGTACGT", "I" * 16 + "####"),
+    ("c", "ACGTNNNTACGT" + primer[:10], "I" * 22),
+]
+
+
+def test_primer_trimmer():
+    t = PrimerTrimmer([primer], min_length=0, chunk_size=2)
+    assert list(t.trim(reads)) == [
+        TrimmedRead(
+            "a extra",
+            "ACGTACGTACGT",
+            "I" * 12,
+            PrimerMatch("Complete", 12, 0, primer),
+            False,
+        ),
+        TrimmedRead("b", "ACGTACGTACGTACGTACGT", "I" * 16 + "####", None, False),
+        TrimmedRead(
+            "c",
+            "ACGTNNNTACGT",
+            "I" * 12,
+            PrimerMatch("Partial", 12, 0, primer[:10]),
+            False,
+        ),
+    ]
+
+
+def test_primer_trimmer_filters():
+    t = PrimerTrimmer(
+        [primer], min_length=13, max_n=2, quality_trimmer=QualityTrimmer(20)
+    )
+    assert [r.desc for r in t.trim(reads)] == ["b"]
+    assert [r.seq for r in t.trim(reads)] == ["ACGTACGTACGTACGT"]
+
+
+def test_primer_trimmer_keep_filtered():
+    t = PrimerTrimmer([primer])
+    # Reads are shorter than the default minimum length of 50
+    assert list(t.trim(reads)) == []
+    trimmed = list(t.trim(reads, keep_filtered=True))
+    assert [r.filtered for r in trimmed] == [True, True, True]
+    assert trimmed[0].match == PrimerMatch("Too short", 35, None, None)
+
+
+def test_primer_trimmer_lazy():
+    t = PrimerTrimmer([primer], min_length=0, chunk_size=1)
+
+    def read_iter():
+        yield reads[0]
+        raise RuntimeError("Read too far")
+
+    trimmed = t.trim(read_iter())
+    assert next(trimmed).seq == "ACGTACGTACGT"
+    with pytest.raises(RuntimeError):
+        next(trimmed)
+
+
+def test_primer_trimmer_engines():
+    results = [
+        list(PrimerTrimmer([primer], min_length=0, engine=engine).trim(reads))
+        for engine in ["python", "bitparallel", "adaptive"]
+    ]
+    assert results[0] == results[1] == results[2]